@@ -1,20 +1,101 @@
-from typing import Dict, List, Any, TypedDict
+from typing import Dict, List, Any, Optional, TypedDict
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+from langchain_core.prompt_values import ChatPromptValue
+from langchain_core.runnables import RunnableLambda
 from langchain_ollama import OllamaLLM
+from .response_cache import ResponseCache, make_cache_key, normalize_content
+from .semantic_cache import SemanticCache, ollama_embedder, scope_hash
+from .. import tracing
+import asyncio
 import json
+import logging
 import os
+import time
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "/app/data/semantic_cache")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "10000"))
+SEMANTIC_CACHE_EMBED_MODEL = os.getenv("SEMANTIC_CACHE_EMBED_MODEL", "nomic-embed-text")
 
 class ChatState(TypedDict):
     messages: List[BaseMessage]
     model_name: str
+    options: Dict[str, Any]
     response: str
     error: str
+    metrics: Dict[str, Any]
+    use_semantic_cache: bool
+    query_embedding: Optional[List[float]]
+    semantic_match: Optional[float]
+
+def _ns_to_seconds(value):
+    return value / 1e9 if value is not None else None
+
+def generation_metrics(generation_info: Dict[str, Any] = None) -> Dict[str, Any]:
+    """Extract token counts and timings from the final chunk of an Ollama generate stream.
+
+    Ollama reports durations in nanoseconds; they are returned in seconds to match
+    the `processing_time` convention used elsewhere.
+    """
+    info = generation_info or {}
+    prompt_tokens = info.get("prompt_eval_count")
+    completion_tokens = info.get("eval_count")
+    tokens_used = None
+    if prompt_tokens is not None or completion_tokens is not None:
+        tokens_used = (prompt_tokens or 0) + (completion_tokens or 0)
+
+    return {
+        "tokens_used": tokens_used,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "load_duration": _ns_to_seconds(info.get("load_duration")),
+        "prompt_eval_duration": _ns_to_seconds(info.get("prompt_eval_duration")),
+        "eval_duration": _ns_to_seconds(info.get("eval_duration")),
+        "total_duration": _ns_to_seconds(info.get("total_duration")),
+    }
+
+def trace_generation(llm_span, generation_info: Dict[str, Any] = None, end_ns: int = None):
+    """Add Ollama's load, prefill and generation phases as child spans of llm_span.
+
+    Ollama reports only durations, so the phases are laid out back to back
+    ending when the response arrived.
+    """
+    info = generation_info or {}
+    llm_span.set_attribute("llm.prompt_tokens", info.get("prompt_eval_count"))
+    llm_span.set_attribute("llm.completion_tokens", info.get("eval_count"))
+    end_ns = end_ns or time.time_ns()
+    for name, duration_key, count_key in (
+        ("ollama.generation", "eval_duration", "eval_count"),
+        ("ollama.prefill", "prompt_eval_duration", "prompt_eval_count"),
+        ("ollama.load", "load_duration", None),
+    ):
+        duration = info.get(duration_key)
+        if not duration:
+            continue
+        attributes = {"tokens": info[count_key]} if count_key and info.get(count_key) is not None else {}
+        tracing.record_span(name, end_ns - duration, end_ns, **attributes)
+        end_ns -= duration
 
 class OllamaChatAgent:
     def __init__(self):
         self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://ollama:11434")
         self.available_models = []
+        self.response_cache = ResponseCache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL)
+        self.semantic_cache = None
+        if SEMANTIC_CACHE_ENABLED:
+            self.semantic_cache = SemanticCache(
+                SEMANTIC_CACHE_PATH,
+                embed=ollama_embedder(self.ollama_base_url, SEMANTIC_CACHE_EMBED_MODEL),
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                capacity=SEMANTIC_CACHE_CAPACITY
+            )
         self._load_available_models()
     
     def _load_available_models(self):
@@ -35,60 +116,151 @@ class OllamaChatAgent:
         """Get list of available models"""
         return self.available_models
     
-    def create_llm(self, model_name: str) -> OllamaLLM:
-        """Create Ollama LLM instance"""
+    def create_llm(self, model_name: str, options: Dict[str, Any] = None) -> OllamaLLM:
+        """Create Ollama LLM instance; options (e.g. temperature, seed) override the defaults"""
+        params = {"temperature": 0.7, **(options or {})}
         return OllamaLLM(
             base_url=self.ollama_base_url,
             model=model_name,
-            temperature=0.7
+            **params
         )
     
+    def _apply_generation(self, state: ChatState, generation) -> ChatState:
+        """Append the generated answer and its metrics to the state"""
+        response = generation.text
+        state["messages"].append(AIMessage(content=response))
+        state["response"] = response
+        state["metrics"] = generation_metrics(generation.generation_info)
+        state["error"] = ""
+        return state
+    
+    def _apply_error(self, state: ChatState, error: Exception) -> ChatState:
+        state["error"] = str(error)
+        state["response"] = ""
+        state["metrics"] = generation_metrics()
+        return state
+    
     def chat_node(self, state: ChatState) -> ChatState:
         """Main chat processing node"""
+        messages = state["messages"]
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            state["error"] = "No valid human message found"
+            return state
+        
+        with tracing.span("llm.generate", **{"llm.model": state["model_name"]}) as llm_span:
+            try:
+                llm = self.create_llm(state["model_name"], state["options"])
+                
+                # generate_prompt (rather than invoke) keeps Ollama's final stream chunk,
+                # which carries the token counts and timings
+                result = llm.generate_prompt([ChatPromptValue(messages=messages)])
+                generation = result.generations[0][0]
+                trace_generation(llm_span, generation.generation_info)
+                return self._apply_generation(state, generation)
+            except Exception as e:
+                llm_span.record_exception(e)
+                return self._apply_error(state, e)
+    
+    async def achat_node(self, state: ChatState) -> ChatState:
+        """Async chat processing node.
+
+        Cancelling the surrounding task closes the Ollama HTTP stream, which makes
+        Ollama stop generating. CancelledError is not an Exception, so it is not
+        turned into a state error here.
+        """
+        messages = state["messages"]
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            state["error"] = "No valid human message found"
+            return state
+        
+        with tracing.span("llm.generate", **{"llm.model": state["model_name"]}) as llm_span:
+            try:
+                llm = self.create_llm(state["model_name"], state["options"])
+                result = await llm.agenerate_prompt([ChatPromptValue(messages=messages)])
+                generation = result.generations[0][0]
+                trace_generation(llm_span, generation.generation_info)
+                return self._apply_generation(state, generation)
+            except Exception as e:
+                llm_span.record_exception(e)
+                return self._apply_error(state, e)
+    
+    def _semantic_scope(self, state: ChatState) -> int:
+        """Cached answers are only reused for the same model, options and prior history"""
+        history = [
+            {"role": msg["role"], "content": normalize_content(msg["content"])}
+            for msg in self._message_dicts(state["messages"][:-1])
+        ]
+        return scope_hash(state["model_name"], state["options"], history)
+    
+    async def semantic_lookup_node(self, state: ChatState) -> ChatState:
+        """Answer from the semantic cache when a close paraphrase was answered before"""
         try:
-            messages = state["messages"]
-            if not messages or not isinstance(messages[-1], HumanMessage):
-                state["error"] = "No valid human message found"
-                return state
-            
-            llm = self.create_llm(state["model_name"])
-            
-            response = llm.invoke(messages)
-            
-            ai_message = AIMessage(content=response)
-            messages.append(ai_message)
-            
-            state["messages"] = messages
-            state["response"] = response
-            state["error"] = ""
-            
+            with tracing.span("semantic_cache.lookup") as lookup_span:
+                payload, similarity, embedding = await self.semantic_cache.lookup(
+                    state["messages"][-1].content, self._semantic_scope(state)
+                )
+                lookup_span.set_attribute("cache.similarity", similarity)
+                lookup_span.set_attribute("cache.hit", payload is not None)
         except Exception as e:
-            state["error"] = str(e)
-            state["response"] = ""
+            # The cache is only an optimization; generate normally if embedding fails
+            logger.warning(f"Semantic cache lookup failed: {str(e)}")
+            return state
         
+        state["query_embedding"] = embedding
+        if payload is not None:
+            state["messages"].append(AIMessage(content=payload["response"]))
+            state["response"] = payload["response"]
+            state["semantic_match"] = similarity
+        return state
+    
+    def route_after_semantic_lookup(self, state: ChatState) -> str:
+        return END if state["semantic_match"] is not None else "chat"
+    
+    async def semantic_store_node(self, state: ChatState) -> ChatState:
+        """Index the prompt and its fresh answer for future paraphrases"""
+        if state["error"] or not state["response"] or state["query_embedding"] is None:
+            return state
+        try:
+            with tracing.span("semantic_cache.store"):
+                await asyncio.to_thread(
+                    self.semantic_cache.store,
+                    state["query_embedding"],
+                    self._semantic_scope({**state, "messages": state["messages"][:-1]}),
+                    {"prompt": state["messages"][-2].content, "response": state["response"]}
+                )
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed: {str(e)}")
         return state
     
-    def create_graph(self) -> StateGraph:
-        """Create the LangGraph workflow"""
+    def create_graph(self, semantic_cache: bool = False) -> StateGraph:
+        """Create the LangGraph workflow.
+
+        With semantic_cache the workflow is
+        semantic_lookup -> (hit: END | miss: chat -> semantic_store -> END);
+        those nodes are async-only, so that graph must be run with ainvoke.
+        """
         workflow = StateGraph(ChatState)
         
-        workflow.add_node("chat", self.chat_node)
+        workflow.add_node("chat", RunnableLambda(self.chat_node, afunc=self.achat_node))
         
-        workflow.set_entry_point("chat")
-        
-        workflow.add_edge("chat", END)
+        if semantic_cache:
+            workflow.add_node("semantic_lookup", self.semantic_lookup_node)
+            workflow.add_node("semantic_store", self.semantic_store_node)
+            workflow.set_entry_point("semantic_lookup")
+            workflow.add_conditional_edges(
+                "semantic_lookup", self.route_after_semantic_lookup, {"chat": "chat", END: END}
+            )
+            workflow.add_edge("chat", "semantic_store")
+            workflow.add_edge("semantic_store", END)
+        else:
+            workflow.set_entry_point("chat")
+            workflow.add_edge("chat", END)
         
         return workflow.compile()
     
-    def chat(self, message: str, model_name: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
-        """Process a chat message and return response"""
-        if model_name not in self.available_models:
-            return {
-                "error": f"Model {model_name} not available. Available models: {self.available_models}",
-                "response": "",
-                "model_name": model_name
-            }
-        
+    def _initial_state(self, message: str, model_name: str, conversation_history: List[Dict] = None,
+                       options: Dict[str, Any] = None, use_semantic_cache: bool = False) -> ChatState:
+        """Build the graph input from the stored history and the new message"""
         messages = []
         if conversation_history:
             for msg in conversation_history:
@@ -107,29 +279,110 @@ class OllamaChatAgent:
         
         messages.append(HumanMessage(content=message))
         
-        initial_state = ChatState(
+        return ChatState(
             messages=messages,
             model_name=model_name,
+            options=options or {},
             response="",
-            error=""
+            error="",
+            metrics=generation_metrics(),
+            use_semantic_cache=use_semantic_cache,
+            query_embedding=None,
+            semantic_match=None
         )
+    
+    def _unavailable_model(self, model_name: str) -> Dict[str, Any]:
+        return {
+            "error": f"Model {model_name} not available. Available models: {self.available_models}",
+            "response": "",
+            "model_name": model_name
+        }
+    
+    def _result(self, final_state: ChatState, model_name: str) -> Dict[str, Any]:
+        result = {
+            "response": final_state["response"],
+            "error": final_state["error"],
+            "model_name": model_name,
+            "metrics": final_state["metrics"],
+            "conversation_history": self._message_dicts(final_state["messages"])
+        }
+        if final_state.get("semantic_match") is not None:
+            result["cache"] = "semantic"
+            result["similarity"] = final_state["semantic_match"]
+        return result
+    
+    @staticmethod
+    def _message_dicts(messages: List[BaseMessage]) -> List[Dict[str, str]]:
+        return [
+            {
+                "role": "user" if isinstance(msg, HumanMessage) else "assistant",
+                "content": msg.content
+            }
+            for msg in messages
+        ]
+    
+    def chat(self, message: str, model_name: str, conversation_history: List[Dict] = None,
+             options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Process a chat message and return response"""
+        if model_name not in self.available_models:
+            return self._unavailable_model(model_name)
+        
+        initial_state = self._initial_state(message, model_name, conversation_history, options)
         
         try:
-            graph = self.create_graph()
-            final_state = graph.invoke(initial_state)
+            with tracing.span("graph.compile"):
+                graph = self.create_graph()
+            with tracing.span("graph.invoke"):
+                final_state = graph.invoke(initial_state)
+            return self._result(final_state, model_name)
             
+        except Exception as e:
             return {
-                "response": final_state["response"],
-                "error": final_state["error"],
-                "model_name": model_name,
-                "conversation_history": [
-                    {
-                        "role": "user" if isinstance(msg, HumanMessage) else "assistant",
-                        "content": msg.content
-                    }
-                    for msg in final_state["messages"]
-                ]
+                "error": f"Graph execution failed: {str(e)}",
+                "response": "",
+                "model_name": model_name
             }
+    
+    async def achat(self, message: str, model_name: str, conversation_history: List[Dict] = None,
+                    options: Dict[str, Any] = None, use_cache: bool = False) -> Dict[str, Any]:
+        """Async variant of chat(); cancelling the awaiting task aborts the generation.
+
+        With use_cache, identical requests (model, options and normalized messages)
+        are answered from the response cache, and concurrent identical requests
+        share a single generation. If the semantic cache is configured, misses
+        then go through its lookup stage in the graph. The result's "cache" key
+        is "hit", "miss", "coalesced" or "semantic"; only the caller that
+        generated gets the token metrics.
+        """
+        if model_name not in self.available_models:
+            return self._unavailable_model(model_name)
+        
+        with tracing.span("agent.achat", **{"llm.model": model_name}) as agent_span:
+            initial_state = self._initial_state(
+                message, model_name, conversation_history, options,
+                use_semantic_cache=use_cache and self.semantic_cache is not None
+            )
+            if not use_cache:
+                return await self._arun_graph(initial_state, model_name)
+            
+            key = make_cache_key(model_name, options, self._message_dicts(initial_state["messages"]))
+            result, status = await self.response_cache.get_or_compute(
+                key, lambda: self._arun_graph(initial_state, model_name)
+            )
+            if status != "miss":
+                result = {**result, "metrics": generation_metrics()}
+            elif result.get("cache"):
+                status = result["cache"]
+            agent_span.set_attribute("cache.status", status)
+            return {**result, "cache": status}
+    
+    async def _arun_graph(self, initial_state: ChatState, model_name: str) -> Dict[str, Any]:
+        try:
+            with tracing.span("graph.compile"):
+                graph = self.create_graph(semantic_cache=initial_state["use_semantic_cache"])
+            with tracing.span("graph.invoke"):
+                final_state = await graph.ainvoke(initial_state)
+            return self._result(final_state, model_name)
             
         except Exception as e:
             return {
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import time
+import unicodedata
+
+
+def normalize_content(content: str) -> str:
+    """Canonical form of a message body for cache keys"""
+    return unicodedata.normalize("NFC", content.replace("\r\n", "\n")).strip()
+
+
+def make_cache_key(model_name: str, options: Optional[Dict[str, Any]], messages: List[Dict[str, str]]) -> str:
+    """Hash of model, generation options and the normalized message list"""
+    payload = {
+        "model": model_name,
+        "options": options or {},
+        "messages": [
+            {"role": msg["role"], "content": normalize_content(msg["content"])}
+            for msg in messages
+        ],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class _Flight:
+    """A generation in progress and the number of callers waiting for it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ResponseCache:
+    """In-process LRU cache for chat results with a TTL and single-flight coalescing.
+
+    Concurrent misses for the same key share one computation. The computation
+    is cancelled only when every caller waiting for it has gone away, so one
+    client disconnecting does not fail the others. Must be used from a single
+    event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (self._clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _finish(self, key: str, flight: _Flight, task: asyncio.Task):
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if not result.get("error"):
+            self.set(key, result)
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict[str, Any]]]) -> Tuple[Dict[str, Any], str]:
+        """Return (result, status) where status is "hit", "miss" or "coalesced"."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached, "hit"
+
+        flight = self._inflight.get(key)
+        status = "coalesced"
+        if flight is None:
+            status = "miss"
+            flight = _Flight(asyncio.ensure_future(compute()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight, task))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), status
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is waiting any more: stop the generation and let the
+                # next request for this key start a fresh one
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                flight.task.cancel()
@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+
+import numpy as np
+
+Embedder = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def scope_hash(*parts: Any) -> int:
+    """Stable 63-bit hash of the context a cached answer is valid in"""
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).digest()
+    return int.from_bytes(digest[:8], "little") >> 1
+
+
+def ollama_embedder(base_url: str, model: str) -> Embedder:
+    """Embed texts through Ollama's embeddings API"""
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(base_url=base_url, model=model).aembed_documents
+
+
+class VectorIndex:
+    """Fixed-capacity in-memory vector index persisted to memory-mapped files.
+
+    Vectors are stored L2-normalized, so cosine similarity is a single matrix
+    product. When the index is full the least recently used entry is replaced.
+    Several processes (e.g. uvicorn workers) can share one index: writes take
+    an exclusive lock on `index.lock`, reads a shared one, and every entry has
+    a random id that its payload must match, so a slot another process has
+    reused is never answered with the old payload.
+    Layout under `path`:
+        header.json    format, dimension and capacity
+        index.lock     flock() target
+        vectors.f32    (capacity, dim) float32 memmap
+        scopes.u64     (capacity,) context hash of each entry
+        ids.u64        (capacity,) id of each entry, 0 for empty slots
+        last_used.f64  (capacity,) last hit/insert time, 0 for empty slots
+        entries.jsonl  append-only log of slot payloads, compacted on open and
+                       whenever it grows past twice the capacity
+    """
+
+    FORMAT = 2
+
+    def __init__(self, path: str, dim: int, capacity: int):
+        self.path = Path(path)
+        self.dim = dim
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock_file = (self.path / "index.lock").open("a")
+        # slot -> (entry id, payload), as last read from or written to the log by this process
+        self.payloads: Dict[int, Tuple[int, Dict[str, Any]]] = {}
+        self._log_lines = 0
+
+        with self._locked(exclusive=True):
+            header_path = self.path / "header.json"
+            header = json.loads(header_path.read_text()) if header_path.exists() else None
+            expected = {"format": self.FORMAT, "dim": dim, "capacity": capacity}
+            mode = "r+" if header == expected else "w+"
+
+            self.vectors = np.memmap(self.path / "vectors.f32", dtype=np.float32, mode=mode, shape=(capacity, dim))
+            self.scopes = np.memmap(self.path / "scopes.u64", dtype=np.uint64, mode=mode, shape=(capacity,))
+            self.ids = np.memmap(self.path / "ids.u64", dtype=np.uint64, mode=mode, shape=(capacity,))
+            self.last_used = np.memmap(self.path / "last_used.f64", dtype=np.float64, mode=mode, shape=(capacity,))
+
+            if mode == "w+":
+                header_path.write_text(json.dumps(expected))
+                (self.path / "entries.jsonl").unlink(missing_ok=True)
+            else:
+                self._read_log()
+                self._rewrite_log()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.last_used))
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Hold the thread lock and the lock file shared between processes"""
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _size(self) -> int:
+        """Slots are filled in order, so everything past the high-water mark is empty.
+
+        Read from the shared files each time, as other processes may have added entries.
+        """
+        occupied = np.flatnonzero(self.last_used)
+        return int(occupied[-1]) + 1 if len(occupied) else 0
+
+    def _read_log(self):
+        """Reload payloads, including those other processes appended"""
+        log_path = self.path / "entries.jsonl"
+        entries = {}
+        lines = 0
+        if log_path.exists():
+            with log_path.open() as log:
+                for line in log:
+                    entry = json.loads(line)
+                    entries[entry["slot"]] = (entry["id"], entry["payload"])
+                    lines += 1
+        # Drop payloads of slots that were never flushed or later overwritten
+        self.payloads = {
+            slot: entry for slot, entry in entries.items()
+            if self.last_used[slot] > 0 and entry[0] == int(self.ids[slot])
+        }
+        self._log_lines = lines
+
+    def _rewrite_log(self):
+        tmp_path = self.path / "entries.jsonl.tmp"
+        with tmp_path.open("w") as log:
+            for slot, (entry_id, payload) in self.payloads.items():
+                log.write(json.dumps({"slot": slot, "id": entry_id, "payload": payload}) + "\n")
+        os.replace(tmp_path, self.path / "entries.jsonl")
+        self._log_lines = len(self.payloads)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def search(self, queries: np.ndarray, scopes: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Best match for each query among entries with the same scope.
+
+        `queries` is (batch, dim). Returns (slots, scores); a slot of -1 means
+        no entry in that scope.
+        """
+        queries = self._normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)))
+        with self._locked(exclusive=False):
+            return self._search(queries, scopes)
+
+    def _search(self, queries: np.ndarray, scopes: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        batch = queries.shape[0]
+        size = self._size()
+        if size == 0:
+            return np.full(batch, -1), np.full(batch, -np.inf, dtype=np.float32)
+
+        scores = queries @ self.vectors[:size].T
+        valid = (self.last_used[:size] > 0)[None, :] & (
+            self.scopes[:size][None, :] == np.asarray(scopes, dtype=np.uint64)[:, None]
+        )
+        scores = np.where(valid, scores, -np.inf)
+        slots = scores.argmax(axis=1)
+        best = scores[np.arange(batch), slots]
+        return np.where(np.isfinite(best), slots, -1), best
+
+    def get(self, slot: int) -> Optional[Dict[str, Any]]:
+        """Payload of a slot, marking it as recently used"""
+        with self._locked(exclusive=False):
+            return self._get(slot)
+
+    def _get(self, slot: int) -> Optional[Dict[str, Any]]:
+        entry_id = int(self.ids[slot])
+        if not entry_id or self.last_used[slot] == 0:
+            return None
+        if self.payloads.get(slot, (0, None))[0] != entry_id:
+            # Written by another process since this one last read the log
+            self._read_log()
+        cached_id, payload = self.payloads.get(slot, (0, None))
+        if cached_id != entry_id:
+            return None
+        self.last_used[slot] = time.time()
+        return payload
+
+    def lookup(self, query: Sequence[float], scope: int, min_score: float) -> Tuple[Optional[Dict[str, Any]], float]:
+        """(payload or None, score) of the best match in scope; no other process can replace it in between"""
+        queries = self._normalize(np.atleast_2d(np.asarray(query, dtype=np.float32)))
+        with self._locked(exclusive=False):
+            [slot], [score] = self._search(queries, [scope])
+            if slot < 0 or score < min_score:
+                return None, float(score)
+            return self._get(int(slot)), float(score)
+
+    def add(self, vector: Sequence[float], scope: int, payload: Dict[str, Any]) -> int:
+        """Insert an entry, evicting the least recently used one when full"""
+        vector = self._normalize(np.asarray(vector, dtype=np.float32))
+        entry_id = secrets.randbits(63) or 1
+        with self._locked(exclusive=True):
+            size = self._size()
+            slot = size if size < self.capacity else int(self.last_used.argmin())
+
+            self.vectors[slot] = vector
+            self.scopes[slot] = scope
+            self.ids[slot] = entry_id
+            self.last_used[slot] = time.time()
+            self.payloads[slot] = (entry_id, payload)
+            with (self.path / "entries.jsonl").open("a") as log:
+                log.write(json.dumps({"slot": slot, "id": entry_id, "payload": payload}) + "\n")
+            self._log_lines += 1
+            if self._log_lines > 2 * self.capacity:
+                self._read_log()
+                self._rewrite_log()
+            self.flush()
+        return slot
+
+    def flush(self):
+        self.vectors.flush()
+        self.scopes.flush()
+        self.ids.flush()
+        self.last_used.flush()
+
+    def close(self):
+        """Flush and release the lock file; the index can't be used afterwards"""
+        with self._lock:
+            self.flush()
+            self._lock_file.close()
+
+
+class SemanticCache:
+    """Answers prompts that are paraphrases of earlier ones from a VectorIndex.
+
+    The index is created on the first embedding, when the embedding dimension
+    is known.
+    """
+
+    def __init__(self, path: str, embed: Embedder, threshold: float = 0.92, capacity: int = 10000):
+        self.path = path
+        self.embed = embed
+        self.threshold = threshold
+        self.capacity = capacity
+        self.index: Optional[VectorIndex] = None
+        self._index_lock = threading.Lock()
+
+    def _get_index(self, dim: int) -> VectorIndex:
+        with self._index_lock:
+            if self.index is None or self.index.dim != dim:
+                if self.index is not None:
+                    self.index.close()
+                self.index = VectorIndex(self.path, dim, self.capacity)
+            return self.index
+
+    async def lookup(self, text: str, scope: int) -> Tuple[Optional[Dict[str, Any]], float, List[float]]:
+        """Return (payload or None, similarity, embedding of text)"""
+        [vector] = await self.embed([text])
+        # Scanning the memory-mapped index (and opening it on first use) blocks; keep it off the event loop
+        payload, score = await asyncio.to_thread(self._search, vector, scope)
+        return payload, score, vector
+
+    def _search(self, vector: List[float], scope: int) -> Tuple[Optional[Dict[str, Any]], float]:
+        return self._get_index(len(vector)).lookup(vector, scope, self.threshold)
+
+    def store(self, vector: List[float], scope: int, payload: Dict[str, Any]) -> int:
+        return self._get_index(len(vector)).add(vector, scope, payload)
@@ -0,0 +1,204 @@
+"""
+Local stand-in for the Ollama HTTP API used by benchmarks and tests.
+
+Implements the endpoints this service calls (`/api/tags`, `/api/version`,
+`/api/pull`, `/api/generate`, `/api/chat`, `/api/embed`) with configurable
+prefill latency, token rate and streaming behaviour, so load tests run fully
+offline. Embeddings are deterministic bag-of-words hashes, so prompts sharing
+most of their words are close in cosine similarity.
+"""
+
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+import hashlib
+import json
+import math
+import threading
+import time
+
+
+@dataclass
+class FakeOllamaConfig:
+    models: List[str] = field(default_factory=lambda: ["llama3.1:8b", "gpt-oss:20b", "mistral:7b"])
+    latency: float = 0.05  # seconds before the first token (model load + prefill)
+    token_rate: float = 200.0  # generated tokens per second
+    num_tokens: int = 32  # tokens generated per response
+    stream: bool = True  # honour "stream": true requests with NDJSON chunks
+    load_duration: float = 0.0  # reported model load time, included in latency
+    embedding_dim: int = 64
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """Normalized bag-of-words vector using hashed word buckets"""
+    vector = [0.0] * dim
+    for word in text.lower().split():
+        word = word.strip(".,!?;:'\"")
+        if word:
+            bucket = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], "little") % dim
+            vector[bucket] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOllamaServer:
+    """Threaded HTTP server emulating Ollama; use as a context manager"""
+
+    def __init__(self, config: FakeOllamaConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeOllamaConfig()
+        self.stats = {"requests": 0, "generations": 0, "completed": 0, "disconnected": 0}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _make_handler(server: FakeOllamaServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload, status=200):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            server.count("requests")
+            if self.path == "/api/tags":
+                self._send_json({
+                    "models": [
+                        {"name": name, "model": name, "size": 4_000_000_000, "modified_at": "2024-01-01T00:00:00Z"}
+                        for name in server.config.models
+                    ]
+                })
+            elif self.path == "/api/version":
+                self._send_json({"version": "0.0.0-fake"})
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def do_POST(self):
+            server.count("requests")
+            body = self._read_json()
+            if self.path == "/api/pull":
+                self._send_json({"status": "success"})
+            elif self.path in ("/api/generate", "/api/chat"):
+                self._generate(body, chat=self.path == "/api/chat")
+            elif self.path == "/api/embed":
+                inputs = body.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                self._send_json({
+                    "model": body.get("model", ""),
+                    "embeddings": [fake_embedding(text, server.config.embedding_dim) for text in inputs],
+                })
+            else:
+                self._send_json({"error": "not found"}, status=404)
+
+        def _generate(self, body, chat: bool):
+            config = server.config
+            model = body.get("model", "")
+            if model not in config.models:
+                self._send_json({"error": f"model '{model}' not found"}, status=404)
+                return
+
+            server.count("generations")
+            if chat:
+                prompt = " ".join(m.get("content", "") for m in body.get("messages", []))
+            else:
+                prompt = body.get("prompt", "")
+            prompt_tokens = max(1, len(prompt.split()))
+            stream = config.stream and body.get("stream", True)
+
+            started = time.perf_counter()
+            time.sleep(config.latency)
+            prefill_done = time.perf_counter()
+
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            tokens = []
+            try:
+                for i in range(config.num_tokens):
+                    if config.token_rate > 0:
+                        time.sleep(1.0 / config.token_rate)
+                    token = f"tok{i} "
+                    tokens.append(token)
+                    if stream:
+                        self._write_chunk(self._chunk(model, token, chat, done=False))
+            except (BrokenPipeError, ConnectionResetError):
+                server.count("disconnected")
+                return
+
+            finished = time.perf_counter()
+            final = self._chunk(model, "" if stream else "".join(tokens), chat, done=True)
+            final.update({
+                "done_reason": "stop",
+                "total_duration": int((finished - started) * 1e9),
+                "load_duration": int(min(config.load_duration, config.latency) * 1e9),
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((prefill_done - started) * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((finished - prefill_done) * 1e9),
+            })
+            try:
+                if stream:
+                    self._write_chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    self._send_json(final)
+            except (BrokenPipeError, ConnectionResetError):
+                server.count("disconnected")
+                return
+            server.count("completed")
+
+        @staticmethod
+        def _chunk(model, text, chat, done):
+            chunk = {"model": model, "created_at": "2024-01-01T00:00:00Z", "done": done}
+            if chat:
+                chunk["message"] = {"role": "assistant", "content": text}
+            else:
+                chunk["response"] = text
+            return chunk
+
+        def _write_chunk(self, payload):
+            data = json.dumps(payload).encode() + b"\n"
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
@@ -0,0 +1,32 @@
+"""
+Stand-in STT engine used by benchmarks and tests.
+
+Transcribing takes audio duration * real-time factor (FAKE_WHISPER_RTF,
+default 0.1) of sleep. The result has one segment per call, whose text gives
+the audio length, so stitching can be checked without real speech. Register
+it with app.speech.engines.register_engine("fake", FakeEngine).
+"""
+
+from typing import Optional
+import os
+import time
+
+from ..speech.engines import STTEngine
+from ..speech.vad import SAMPLE_RATE
+
+
+class FakeEngine(STTEngine):
+    name = "fake"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, interop_threads: Optional[int] = None):
+        super().__init__(model_name, threads, interop_threads)
+        self.rtf = float(os.getenv("FAKE_WHISPER_RTF", "0.1"))
+
+    def _transcribe(self, audio, language):
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        return {
+            "text": f" speech {duration:.2f}s",
+            "language": language or "en",
+            "segments": [{"start": 0.0, "end": duration, "text": f" speech {duration:.2f}s"}],
+        }
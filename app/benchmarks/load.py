@@ -0,0 +1,300 @@
+"""
+Offline load test for the FastAPI service.
+
+Starts a FakeOllamaServer, runs the app under uvicorn in a background thread
+and drives `/chat/`, `/ollama/models/` and `/stt/transcribe` at a fixed
+concurrency. Reports throughput and p50/p95/p99 latency of the successful
+(2xx) requests, the errors, and event-loop lag of the server loop, and writes the results as JSON so runs on different commits
+can be compared.
+
+The chat scenario persists interactions, so DATABASE_URL must point at a
+reachable (local) PostgreSQL. The STT scenario uses a fake Whisper model with
+a configurable real-time factor unless --real-whisper is given.
+
+Usage:
+    python -m app.benchmarks.load --concurrency 8 --requests 200
+    python -m app.benchmarks.load --scenarios chat --token-rate 50 --compare bench_results/abc123.json
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import wave
+
+from . import fake_whisper
+from .fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from .stats import summarize
+
+SCENARIOS = ("ollama_models", "chat", "stt")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent in-flight requests")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests per scenario")
+    parser.add_argument("--model", default="llama3.1:8b", help="Model name sent to /chat/")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake Ollama time to first token (s)")
+    parser.add_argument("--token-rate", type=float, default=200.0, help="Fake Ollama tokens per second")
+    parser.add_argument("--num-tokens", type=int, default=32, help="Fake Ollama tokens per response")
+    parser.add_argument("--no-stream", action="store_true", help="Fake Ollama ignores stream=true")
+    parser.add_argument("--audio-seconds", type=float, default=5.0, help="Length of the generated test audio")
+    parser.add_argument("--stt-model", default="tiny", help="Whisper model requested from /stt/transcribe")
+    parser.add_argument("--stt-rtf", type=float, default=0.1, help="Real-time factor of the fake Whisper model")
+    parser.add_argument("--real-whisper", action="store_true", help="Use real Whisper weights (must be cached)")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="Event-loop lag probe interval (s)")
+    parser.add_argument("--output", default="bench_results", help="Directory or .json file for results")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed relative p95/throughput regression before exiting non-zero")
+    return parser.parse_args(argv)
+
+
+def make_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """16-bit mono WAV: alternating 1s of 440Hz tone and 0.5s of silence"""
+    frames = bytearray()
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        sample = int(8000 * math.sin(2 * math.pi * 440 * t)) if (t % 1.5) < 1.0 else 0
+        frames += sample.to_bytes(2, "little", signed=True)
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(bytes(frames))
+    return buffer.getvalue()
+
+
+class ServerThread:
+    """Runs the app with uvicorn on its own event loop in a background thread"""
+
+    def __init__(self, app, lag_interval: float):
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.loop = asyncio.new_event_loop()
+        self.lag_interval = lag_interval
+        self.lag_samples = []
+        self._thread = threading.Thread(target=self._run, name="bench-server", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_until_complete(self.server.serve())
+
+    async def _probe_lag(self):
+        while not self.server.should_exit:
+            expected = time.perf_counter() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            now = time.perf_counter()
+            self.lag_samples.append((now, max(0.0, now - expected)))
+
+    def lag_between(self, start: float, end: float):
+        return [lag for at, lag in self.lag_samples if start <= at <= end]
+
+    def start(self):
+        self._thread.start()
+        deadline = time.time() + 60
+        while not self.server.started:
+            if time.time() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+        asyncio.run_coroutine_threadsafe(self._probe_lag(), self.loop)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+async def run_scenario(name, send, total, concurrency, warmup, server):
+    """Issue `total` requests through `send(client, i)` with bounded concurrency"""
+    import httpx
+
+    latencies, statuses = [], {}
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=None) as client:
+        for i in range(warmup):
+            await send(client, i)
+
+        queue = iter(range(total))
+
+        async def worker():
+            for i in queue:
+                started = time.perf_counter()
+                try:
+                    status = (await send(client, i)).status_code
+                except Exception as e:
+                    status = type(e).__name__
+                # Failures are often fast; counting them would make an erroring build look quicker
+                if str(status).startswith("2"):
+                    latencies.append(time.perf_counter() - started)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    result = {
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "duration": elapsed,
+        # Successful requests per second; None when nothing succeeded
+        "throughput": len(latencies) / elapsed if latencies and elapsed else None,
+        "latency": summarize(latencies),
+        "loop_lag": summarize(server.lag_between(started, started + elapsed)),
+    }
+    latency = result["latency"]
+    print(f"{name:>14}: {format_rate(result['throughput'])}, p50 {format_ms(latency['p50'])}, "
+          f"p95 {format_ms(latency['p95'])}, p99 {format_ms(latency['p99'])}, errors {errors}")
+    return result
+
+
+def format_ms(seconds):
+    return "n/a" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+
+def format_rate(rps):
+    return "n/a" if rps is None else f"{rps:.1f} req/s"
+
+
+def relative_change(value, base):
+    """(value - base) / base, or None when either is missing or base is 0"""
+    if value is None or not base:
+        return None
+    return (value - base) / base
+
+
+def build_senders(args):
+    audio = make_wav(args.audio_seconds)
+
+    async def ollama_models(client, i):
+        return await client.get("/ollama/models/")
+
+    async def chat(client, i):
+        return await client.post("/chat/", json={"message": f"benchmark prompt {i}", "model_name": args.model})
+
+    async def stt(client, i):
+        return await client.post(
+            "/stt/transcribe",
+            params={"model": args.stt_model},
+            files={"audio_file": ("bench.wav", audio, "audio/wav")},
+        )
+
+    return {"ollama_models": ollama_models, "chat": chat, "stt": stt}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def write_results(results, output):
+    path = Path(output)
+    if path.suffix != ".json":
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        path = path / f"{results['commit'] or 'nogit'}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+
+def format_delta(delta):
+    return "n/a" if delta is None else f"{delta:+.1%}"
+
+
+def compare(current, baseline, max_regression):
+    """Print per-scenario deltas and return the list of regressions beyond the threshold"""
+    regressions = []
+    print(f"\nComparison against {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        p95, base_p95 = result["latency"]["p95"], base["latency"]["p95"]
+        rps, base_rps = result["throughput"], base["throughput"]
+        p95_delta = relative_change(p95, base_p95)
+        rps_delta = relative_change(rps, base_rps)
+        print(f"{name:>14}: p95 {format_ms(base_p95)} -> {format_ms(p95)} ({format_delta(p95_delta)}), "
+              f"throughput {format_rate(base_rps)} -> {format_rate(rps)} ({format_delta(rps_delta)})")
+        # A scenario where nothing succeeds any more is a regression, whatever the numbers say
+        failed = rps is None and base_rps is not None
+        if failed or (p95_delta or 0.0) > max_regression or (rps_delta or 0.0) < -max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = FakeOllamaConfig(
+        latency=args.latency,
+        token_rate=args.token_rate,
+        num_tokens=args.num_tokens,
+        stream=not args.no_stream,
+    )
+
+    with FakeOllamaServer(config) as ollama:
+        # Routers read OLLAMA_BASE_URL at import time, so set it before importing the app
+        os.environ["OLLAMA_BASE_URL"] = ollama.base_url
+        from ..main import app
+
+        if "stt" in args.scenarios and not args.real_whisper:
+            from ..routers import stt
+            from ..speech.engines import register_engine
+            os.environ["FAKE_WHISPER_RTF"] = str(args.stt_rtf)
+            register_engine("fake", fake_whisper.FakeEngine)
+            stt.STT_ENGINE = "fake"
+
+        server = ServerThread(app, args.lag_interval).start()
+        senders = build_senders(args)
+        try:
+            scenarios = {
+                name: asyncio.run(run_scenario(name, senders[name], args.requests, args.concurrency,
+                                               args.warmup, server))
+                for name in args.scenarios
+            }
+        finally:
+            server.stop()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "fake_ollama": ollama.stats,
+        "scenarios": scenarios,
+    }
+    path = write_results(results, args.output)
+    print(f"Results written to {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"Regressions beyond {args.max_regression:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
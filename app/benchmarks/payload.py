@@ -0,0 +1,140 @@
+"""
+Chat response payload benchmark.
+
+For sessions of increasing length, measures the bytes a `/chat/` response
+ships for each history mode (full, since the last 10 turns, new turn only),
+raw and with gzip/brotli compression, and the time to serialize the payload
+the way FastAPI does for a `response_model` route (pydantic-core `dump_json`)
+versus `model_dump` + orjson. Also times serializing the stored
+`conversation_history` column with `json.dumps` versus orjson. Runs fully offline: the payloads
+are synthetic and nothing is sent over HTTP.
+
+Usage:
+    python -m app.benchmarks.payload
+    python -m app.benchmarks.payload --turns 10 100 500 --message-words 200
+"""
+
+from datetime import datetime, timezone
+import argparse
+import gzip
+import json
+import sys
+import timeit
+
+import brotli
+import orjson
+from pydantic import TypeAdapter
+
+from ..routers.chat import ChatRequest, ChatResponse
+from .load import git_commit, write_results
+
+HISTORY_MODES = {
+    "full": {"history": "full"},
+    "since_last_10": {"history": "since"},
+    "new": {"history": "new"},
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", nargs="+", type=int, default=[1, 10, 50, 100, 250, 500],
+                        help="Session lengths (completed turns before the new one)")
+    parser.add_argument("--message-words", type=int, default=120, help="Words per user/assistant message")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed serializations per measurement")
+    parser.add_argument("--output", default="bench_results", help="Directory or .json file for results")
+    return parser.parse_args(argv)
+
+
+def make_history(turns: int, words: int):
+    """Synthetic conversation of `turns` user/assistant pairs"""
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": " ".join(f"q{turn}w{i}" for i in range(words // 4))})
+        history.append({"role": "assistant", "content": " ".join(f"a{turn}w{i}" for i in range(words))})
+    return history
+
+
+def build_response(history, mode: str) -> ChatResponse:
+    """ChatResponse for the turn completing `history`, trimmed as /chat/ would for `mode`"""
+    turn_index = len(history) // 2 - 1
+    request = ChatRequest(message="", model_name="llama3.1:8b", since_turn=max(0, turn_index - 10),
+                          **HISTORY_MODES[mode])
+    history_start = request.history_start(turn_index)
+    return ChatResponse(
+        response=history[-1]["content"],
+        error="",
+        model_name="llama3.1:8b",
+        conversation_history=history[2 * history_start:],
+        session_id="00000000-0000-0000-0000-000000000000",
+        processing_time=1.0,
+        tokens_used=100,
+        turn_index=turn_index,
+        history_start=history_start,
+    )
+
+
+def time_ms(func, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+
+def measure(turns: int, words: int, repeat: int):
+    history = make_history(turns + 1, words)
+    result = {"turns": turns, "modes": {}}
+    adapter = TypeAdapter(ChatResponse)
+
+    for mode in HISTORY_MODES:
+        response = build_response(history, mode)
+        content = response.model_dump(mode="json")
+        body = orjson.dumps(content)
+        result["modes"][mode] = {
+            "bytes": len(body),
+            "gzip_bytes": len(gzip.compress(body, compresslevel=9)),
+            "brotli_bytes": len(brotli.compress(body, quality=4)),
+            # FastAPI's default path for response_model routes: validated model serialized by pydantic-core
+            "fastapi_ms": time_ms(lambda: adapter.dump_json(response), repeat),
+            "orjson_ms": time_ms(lambda: orjson.dumps(adapter.dump_python(response, mode="json")), repeat),
+            "gzip_ms": time_ms(lambda: gzip.compress(body, compresslevel=9), repeat),
+            "brotli_ms": time_ms(lambda: brotli.compress(body, quality=4), repeat),
+        }
+
+    result["storage"] = {
+        "bytes": len(orjson.dumps(history)),
+        "json_dumps_ms": time_ms(lambda: json.dumps(history), repeat),
+        "orjson_ms": time_ms(lambda: orjson.dumps(history).decode(), repeat),
+    }
+    return result
+
+
+def print_table(rows):
+    print(f"{'turns':>6} {'mode':>14} {'bytes':>10} {'gzip':>9} {'br':>9} "
+          f"{'fastapi ms':>10} {'orjson ms':>10} {'gzip ms':>8} {'br ms':>7}")
+    for row in rows:
+        for mode, m in row["modes"].items():
+            print(f"{row['turns']:>6} {mode:>14} {m['bytes']:>10} {m['gzip_bytes']:>9} {m['brotli_bytes']:>9} "
+                  f"{m['fastapi_ms']:>10.3f} {m['orjson_ms']:>10.3f} {m['gzip_ms']:>8.3f} {m['brotli_ms']:>7.3f}")
+    print(f"\n{'turns':>6} {'stored bytes':>13} {'json.dumps ms':>14} {'orjson ms':>10}")
+    for row in rows:
+        s = row["storage"]
+        print(f"{row['turns']:>6} {s['bytes']:>13} {s['json_dumps_ms']:>14.3f} {s['orjson_ms']:>10.3f}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = [measure(turns, args.message_words, args.repeat) for turns in args.turns]
+    print_table(rows)
+
+    results = {
+        "benchmark": "payload",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "sessions": rows,
+    }
+    path = write_results(results, args.output)
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Summary statistics shared by the benchmark scripts."""
+
+from typing import Dict, Iterable, List, Optional
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Linearly interpolated percentile (q in 0..100) of an already sorted list; None if it is empty"""
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * q / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def summarize(values: Iterable[float]) -> Dict[str, Optional[float]]:
+    """Count, mean, max and p50/p95/p99 of a sample"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0, "mean": None, "max": None, "p50": None, "p95": None, "p99": None}
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "max": ordered[-1],
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+    }
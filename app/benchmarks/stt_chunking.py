@@ -0,0 +1,123 @@
+"""
+Benchmark for chunked parallel transcription.
+
+Builds a synthetic recording: bursts of noise-modulated tone ("speech") with
+pauses between them. It is transcribed once as a single sequential call,
+then through the VAD + worker pool pipeline with increasing worker counts.
+Reports wall-clock time, speedup, chunk count and how much audio was sent to
+the model after silence removal.
+
+With the default fake engine, each call sleeps for audio duration * --rtf.
+This measures the pipeline's orchestration and the silence saved, not model
+compute. Pass --engine whisper or whisper-cpu (weights must be cached) to
+measure actual scaling across cores.
+
+Usage:
+    python -m app.benchmarks.stt_chunking --minutes 10 --workers 1 2 4
+    python -m app.benchmarks.stt_chunking --engine whisper-cpu --model tiny --minutes 5
+"""
+
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+from ..speech.engines import get_engine_class, register_engine
+from ..speech.pool import TranscriptionPool
+from ..speech.vad import SAMPLE_RATE
+from . import fake_whisper
+from .load import git_commit, write_results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=10.0, help="Length of the synthetic recording")
+    parser.add_argument("--speech-seconds", type=float, default=8.0, help="Length of each speech burst")
+    parser.add_argument("--pause-seconds", type=float, default=4.0, help="Silence between bursts")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4], help="Pool sizes to measure")
+    parser.add_argument("--model", default="tiny", help="Whisper model name")
+    parser.add_argument("--rtf", type=float, default=0.05, help="Real-time factor of the fake model")
+    parser.add_argument("--engine", default="fake", help="STT engine: fake, whisper or whisper-cpu")
+    parser.add_argument("--output", default="bench_results", help="Directory or .json file for results")
+    return parser.parse_args(argv)
+
+
+def make_recording(seconds: float, speech_seconds: float, pause_seconds: float, seed: int = 0) -> np.ndarray:
+    """Speech-like bursts (tone with a noisy syllable envelope) separated by low-level noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    in_speech = (t % (speech_seconds + pause_seconds)) < speech_seconds
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    voice = 0.3 * syllables * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+    background = 0.001 * rng.standard_normal(len(t))
+    return np.where(in_speech, voice, background).astype(np.float32)
+
+
+def run_pool(audio: np.ndarray, workers: int, engine: str, model: str):
+    pool = TranscriptionPool(model, workers, engine=engine)
+    try:
+        # Start every worker and load the model before timing
+        asyncio.run(pool.transcribe(audio[:SAMPLE_RATE], pool.plan(audio[:SAMPLE_RATE]) * workers))
+
+        started = time.perf_counter()
+        chunks = pool.plan(audio)
+        planned = time.perf_counter()
+        result = asyncio.run(pool.transcribe(audio, chunks))
+        finished = time.perf_counter()
+    finally:
+        pool.shutdown()
+    return {
+        "workers": workers,
+        "wall_seconds": finished - started,
+        "vad_seconds": planned - started,
+        "chunks": len(chunks),
+        "speech_seconds": sum(chunk.samples for chunk in chunks) / SAMPLE_RATE,
+        "segments": len(result["segments"]),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ["FAKE_WHISPER_RTF"] = str(args.rtf)
+    register_engine("fake", fake_whisper.FakeEngine)
+    audio = make_recording(args.minutes * 60, args.speech_seconds, args.pause_seconds)
+    duration = len(audio) / SAMPLE_RATE
+
+    engine = get_engine_class(args.engine)(args.model)
+    started = time.perf_counter()
+    engine.transcribe(audio)
+    sequential = time.perf_counter() - started
+    print(f"{duration:.0f}s recording, single sequential call: {sequential:.2f}s (RTF {sequential / duration:.3f})")
+
+    runs = []
+    for workers in args.workers:
+        run = run_pool(audio, workers, args.engine, args.model)
+        run["speedup"] = sequential / run["wall_seconds"]
+        run["rtf"] = run["wall_seconds"] / duration
+        runs.append(run)
+        print(f"{workers:>3} workers: {run['wall_seconds']:.2f}s (x{run['speedup']:.2f}, RTF {run['rtf']:.3f}), "
+              f"{run['chunks']} chunks, {run['speech_seconds']:.0f}s of {duration:.0f}s sent to the model, "
+              f"VAD {run['vad_seconds'] * 1000:.0f}ms")
+
+    results = {
+        "benchmark": "stt_chunking",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "duration_seconds": duration,
+        "sequential_seconds": sequential,
+        "runs": runs,
+    }
+    path = write_results(results, args.output)
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+STT engine benchmark: real-time factor per engine and model size.
+
+Each engine/model pair is measured on the two paths the API serves:
+    inprocess  app.routers.stt.transcribe_whole, as used for short
+               recordings, with the engine loaded in this process
+    pool       a single-worker transcription pool (a fresh process), as used
+               for the chunks of long recordings
+The benchmark reports load time (weights and quantization, plus process
+start for the pool), then transcribes the recording whole, once as a warm-up
+and --repeat times measured, and reports the real-time factor (processing
+time / audio length; below 1 is faster than real time) and the precision the
+engine actually used, which shows when int8 fell back to fp32. Inter-op
+threads can only be set once per process, so on the inprocess path the first
+engine's setting applies to all of them.
+
+Engines are given as name[:quantization], e.g. whisper-cpu:none for the CPU
+engine in fp32. Pass --audio with a real recording: Whisper's decoding time
+depends on what it hears, and on the synthetic default it may decode noise.
+
+Usage:
+    python -m app.benchmarks.stt_engines --engines whisper whisper-cpu:none whisper-cpu --models tiny base small
+    python -m app.benchmarks.stt_engines --audio speech.wav --threads 4
+    python -m app.benchmarks.stt_engines --paths inprocess --engines whisper-cpu --models base
+    python -m app.benchmarks.stt_engines --engines fake --models tiny  # offline smoke run
+"""
+
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+from ..routers import stt
+from ..speech.audio import load_audio
+from ..speech.engines import register_engine
+from ..speech.pool import TranscriptionPool
+from ..speech.vad import SAMPLE_RATE
+from . import fake_whisper
+from .load import git_commit, write_results
+from .stt_chunking import make_recording
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=["whisper", "whisper-cpu:none", "whisper-cpu"],
+                        help="Engines to measure, as name[:quantization]")
+    parser.add_argument("--models", nargs="+", default=["tiny", "base", "small"], help="Whisper model sizes")
+    parser.add_argument("--audio", help="Recording to transcribe (default: 30s synthetic speech-like audio)")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the synthetic recording")
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="Intra-op threads")
+    parser.add_argument("--interop-threads", type=int, default=1, help="Inter-op threads")
+    parser.add_argument("--paths", nargs="+", choices=["inprocess", "pool"], default=["inprocess", "pool"],
+                        help="Transcription paths to measure")
+    parser.add_argument("--repeat", type=int, default=3, help="Measured transcriptions per engine and model")
+    parser.add_argument("--output", default="bench_results", help="Directory or .json file for results")
+    return parser.parse_args(argv)
+
+
+def time_calls(transcribe, repeat: int) -> list:
+    """Seconds per call, after one warm-up call"""
+    transcribe()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        transcribe()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_inprocess(audio, engine: str, model: str, quantization: str, args):
+    """(info, load seconds, timings) of the API's in-process path, configured like its STT_* settings"""
+    stt.STT_INTRA_OP_THREADS = args.threads
+    stt.STT_INTER_OP_THREADS = args.interop_threads
+    stt.STT_QUANTIZATION = quantization or "int8"
+    stt.get_engine.cache_clear()
+    try:
+        started = time.perf_counter()
+        info = stt.get_engine(engine, model).info()
+        load_seconds = time.perf_counter() - started
+        timings = time_calls(lambda: stt.transcribe_whole(audio, engine, model, None), args.repeat)
+    finally:
+        stt.get_engine.cache_clear()
+    return info, load_seconds, timings
+
+
+def run_pool(audio, engine: str, model: str, quantization: str, args):
+    """(info, load seconds, timings) of one transcription pool worker"""
+    options = {"quantization": quantization} if quantization else {}
+    pool = TranscriptionPool(model, 1, engine=engine, threads=args.threads,
+                             interop_threads=args.interop_threads, **options)
+    try:
+        started = time.perf_counter()
+        info = asyncio.run(pool.info())
+        load_seconds = time.perf_counter() - started
+        timings = time_calls(lambda: asyncio.run(pool.transcribe_whole(audio)), args.repeat)
+    finally:
+        pool.shutdown()
+    return info, load_seconds, timings
+
+
+PATHS = {"inprocess": run_inprocess, "pool": run_pool}
+
+
+def run_engine(audio, path: str, spec: str, model: str, args) -> dict:
+    engine, _, quantization = spec.partition(":")
+    info, load_seconds, timings = PATHS[path](audio, engine, model, quantization, args)
+
+    seconds = statistics.median(timings)
+    return {
+        "path": path,
+        "engine": spec,
+        "model": model,
+        "precision": info["precision"],
+        "device": info["device"],
+        "load_seconds": load_seconds,
+        "transcribe_seconds": seconds,
+        "rtf": seconds / (len(audio) / SAMPLE_RATE),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    register_engine("fake", fake_whisper.FakeEngine)
+    audio = load_audio(args.audio) if args.audio else make_recording(args.seconds, 8.0, 1.0)
+    duration = len(audio) / SAMPLE_RATE
+    print(f"{duration:.1f}s recording, {args.threads} intra-op / {args.interop_threads} inter-op threads")
+
+    runs = []
+    for model in args.models:
+        for spec in args.engines:
+            for path in args.paths:
+                try:
+                    run = run_engine(audio, path, spec, model, args)
+                except Exception as e:
+                    print(f"{model:>8} {spec:<18} {path:<9} failed: {e}")
+                    runs.append({"path": path, "engine": spec, "model": model, "error": str(e)})
+                    continue
+                runs.append(run)
+                print(f"{model:>8} {spec:<18} {path:<9} {run['precision']:>5} on {run['device']}: "
+                      f"RTF {run['rtf']:.3f} ({run['transcribe_seconds']:.2f}s), load {run['load_seconds']:.1f}s")
+
+    results = {
+        "benchmark": "stt_engines",
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "duration_seconds": duration,
+        "runs": runs,
+    }
+    path = write_results(results, args.output)
+    print(f"Results written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
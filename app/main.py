@@ -1,16 +1,41 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+from importlib import import_module
+from brotli_asgi import BrotliMiddleware
 from .database import init_db, close_db
-from .routers.models.ollama import router as ollama_models_router
-from .routers.database_models import router as database_models_router
-from .routers import chat
-from .routers import stt
+from .tracing import TracingMiddleware
+import os
+
+# name -> (module, prefix, tags). Router modules only import their heavy
+# dependencies (LangChain/LangGraph, whisper/torch) on first use.
+ROUTERS = {
+    "ollama": (".routers.models.ollama", "/ollama/models", ["ollama-models"]),
+    "models": (".routers.database_models", "/models", ["database-models"]),
+    "chat": (".routers.chat", "/chat", ["chat"]),
+    "stt": (".routers.stt", "/stt", ["speech-to-text"]),
+    "analytics": (".routers.analytics", "/analytics", ["analytics"]),
+    "admin": (".routers.admin", "/admin", ["admin"]),
+}
+# The admin router (profiler, recent traces) must be enabled explicitly
+DEFAULT_ROUTERS = [name for name in ROUTERS if name != "admin"]
+
+# Comma-separated subset of ROUTERS to serve, e.g. "models,analytics" for a DB-only pod
+ENABLED_ROUTERS = [
+    name.strip() for name in os.getenv("ENABLED_ROUTERS", ",".join(DEFAULT_ROUTERS)).split(",") if name.strip()
+]
+
+# Compress responses of at least this many bytes with brotli, or gzip for
+# clients that don't accept br; 0 disables compression
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     await init_db()
     yield
+    if "stt" in ENABLED_ROUTERS:
+        # Stop the transcription worker processes instead of leaving them to interpreter exit
+        import_module(ROUTERS["stt"][0], __package__).pools.close()
     await close_db()
 
 app = FastAPI(
@@ -22,10 +47,17 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-app.include_router(ollama_models_router, prefix="/ollama/models", tags=["ollama-models"])
-app.include_router(database_models_router, prefix="/models", tags=["database-models"])
-app.include_router(chat.router, prefix="/chat", tags=["chat"])
-app.include_router(stt.router, prefix="/stt", tags=["speech-to-text"])
+if RESPONSE_COMPRESSION_MIN_SIZE > 0:
+    # Quality 4 compresses a 100-turn history in under a millisecond (see benchmarks/payload.py)
+    app.add_middleware(BrotliMiddleware, quality=4, minimum_size=RESPONSE_COMPRESSION_MIN_SIZE, gzip_fallback=True)
+# Added last so the request span also covers compression
+app.add_middleware(TracingMiddleware)
+
+for name in ENABLED_ROUTERS:
+    if name not in ROUTERS:
+        raise RuntimeError(f"Unknown router {name!r} in ENABLED_ROUTERS. Available: {', '.join(ROUTERS)}")
+    module, prefix, tags = ROUTERS[name]
+    app.include_router(import_module(module, __package__).router, prefix=prefix, tags=tags)
 
 @app.get("/")
 async def root():
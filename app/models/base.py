@@ -1,12 +1,30 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime, timezone
 from typing import Optional
 from uuid import uuid4
 
+# Text search configuration used for chat history search
+SEARCH_CONFIG = "english"
+
 class TimestampMixin:
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class GenerationMetricsMixin:
+    """Token counts and Ollama-reported timings (in seconds) for a single generation.
+
+    Only ChatInteraction records them; ModelRequest rows come from the /models
+    CRUD API, which runs no generation, so their tokens_used is whatever the client sent.
+    """
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    load_duration: Optional[float] = None
+    prompt_eval_duration: Optional[float] = None
+    eval_duration: Optional[float] = None
+    total_duration: Optional[float] = None
+
 class ModelRequest(SQLModel, TimestampMixin, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     request_id: str = Field(default_factory=lambda: str(uuid4()))
@@ -18,13 +36,29 @@ class ModelRequest(SQLModel, TimestampMixin, table=True):
     tokens_used: Optional[int] = None
     error_message: Optional[str] = None
 
-class ChatInteraction(SQLModel, TimestampMixin, table=True):
+class ChatInteraction(SQLModel, TimestampMixin, GenerationMetricsMixin, table=True):
+    __table_args__ = (
+        Index("ix_chatinteraction_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     session_id: str = Field(default_factory=lambda: str(uuid4()), index=True)
     model_name: str = Field(index=True)
     user_message: str
     ai_response: str
     conversation_history: Optional[str] = Field(default=None)
+    # completed | cancelled (client disconnected) | timeout (deadline exceeded)
+    status: str = Field(default="completed", index=True, sa_column_kwargs={"server_default": "completed"})
+    # answered from the response cache without a generation of its own
+    cached: bool = Field(default=False, sa_column_kwargs={"server_default": "false"})
     tokens_used: Optional[int] = None
     processing_time: Optional[float] = None
     error_message: Optional[str] = None
+    # Maintained by Postgres on insert/update; searched through the GIN index above
+    search_vector: Optional[str] = Field(
+        default=None,
+        sa_column=Column(TSVECTOR, Computed(
+            f"to_tsvector('{SEARCH_CONFIG}', coalesce(user_message, '') || ' ' || coalesce(ai_response, ''))",
+            persisted=True
+        ))
+    )
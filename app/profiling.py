@@ -0,0 +1,58 @@
+"""
+Sampling profiler for the live process.
+
+Periodically snapshots the Python stack of every thread with
+sys._current_frames() and counts identical stacks. The output is in the
+collapsed-stack format read by flamegraph.pl, speedscope and inferno:
+    thread;outer_frame;...;inner_frame count
+Sampling adds no overhead to the profiled code between samples, so it is
+safe to run on a serving process.
+"""
+
+from collections import Counter
+from typing import Dict
+import os
+import sys
+import threading
+import time
+
+# Leaf frames in these modules mean the thread is parked (event loop select,
+# idle thread pool worker, lock wait) rather than doing work
+IDLE_MODULES = ("selectors.py", "threading.py", "queue.py", "concurrent/futures/thread.py")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{code.co_firstlineno}"
+
+
+def sample_stacks(seconds: float, interval: float = 0.005, include_idle: bool = False) -> Counter:
+    """Sample all other threads' stacks every `interval` seconds for `seconds`"""
+    own_thread = threading.get_ident()
+    stacks: Counter = Counter()
+    thread_names: Dict[int, str] = {}
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        frames = sys._current_frames()
+        if frames.keys() - thread_names.keys():
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in frames.items():
+            if thread_id == own_thread:
+                continue
+            if not include_idle and frame.f_code.co_filename.endswith(IDLE_MODULES):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(thread_names.get(thread_id, str(thread_id)).replace(" ", "_"))
+            stacks[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def collapsed(stacks: Counter) -> str:
+    """Collapsed-stack text, most frequent stacks first"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
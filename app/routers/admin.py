@@ -0,0 +1,68 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional
+from .. import profiling, tracing
+import asyncio
+import os
+
+router = APIRouter()
+
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+_profile_lock = asyncio.Lock()
+
+class TraceSummary(BaseModel):
+    trace_id: str
+    name: str
+    duration_ms: Optional[float] = None
+    status: str
+    spans: int
+
+class TraceDetail(BaseModel):
+    trace_id: str
+    spans: List[Dict[str, Any]]
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(default=10.0, gt=0, le=PROFILE_MAX_SECONDS, description="How long to sample"),
+    interval_ms: float = Query(default=5.0, ge=1, le=1000, description="Time between samples"),
+    include_idle: bool = Query(default=False, description="Keep samples of parked threads (event loop select, idle workers)")
+):
+    """Run a sampling profiler on the live process and return collapsed stacks.
+
+    The output can be rendered with `flamegraph.pl`, speedscope or inferno.
+    Only one profile runs at a time.
+    """
+    if _profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with _profile_lock:
+        # Sample from a worker thread so the event loop keeps serving (and is profiled)
+        stacks = await run_in_threadpool(profiling.sample_stacks, seconds, interval_ms / 1000, include_idle)
+    return PlainTextResponse(profiling.collapsed(stacks))
+
+@router.get("/traces", response_model=List[TraceSummary])
+def recent_traces(limit: int = Query(default=50, ge=1, le=1000)):
+    """Most recent sampled traces, newest first"""
+    summaries = []
+    for trace in list(tracing.exporter.recent)[::-1][:limit]:
+        root = trace.root.to_dict()
+        summaries.append(TraceSummary(
+            trace_id=trace.trace_id,
+            name=root["name"],
+            duration_ms=root["duration_ms"],
+            status=root["status"],
+            spans=len(trace.spans)
+        ))
+    return summaries
+
+@router.get("/traces/{trace_id}", response_model=TraceDetail)
+def get_trace(trace_id: str):
+    """All spans of a recent trace, e.g. the one named by a response's X-Trace-Id header"""
+    trace = tracing.exporter.find(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (not sampled or no longer buffered)")
+    spans = sorted((s.to_dict() for s in list(trace.spans)), key=lambda s: s["start_ns"])
+    return TraceDetail(trace_id=trace_id, spans=spans)
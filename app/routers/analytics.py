@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlmodel import Session, select, func
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from ..database import get_db
+from ..models.base import ChatInteraction
+
+router = APIRouter()
+
+class ModelUsageStats(BaseModel):
+    model_name: str
+    requests: int
+    latency_p50: Optional[float] = None
+    latency_p95: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+    prompt_tokens_per_second: Optional[float] = None
+    avg_load_duration: Optional[float] = None
+    max_load_duration: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    prompt_eval_duration: Optional[float] = None
+    eval_duration: Optional[float] = None
+    prompt_eval_share: Optional[float] = None
+
+class UsageAnalyticsResponse(BaseModel):
+    since: datetime
+    until: datetime
+    models: List[ModelUsageStats]
+
+@router.get("/usage", response_model=UsageAnalyticsResponse)
+def get_usage_analytics(
+    hours: float = Query(default=24, gt=0, description="Size of the time window, ending now"),
+    model_name: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Per-model latency, throughput and prompt-vs-generation split, aggregated in SQL"""
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(hours=hours)
+
+    latency = ChatInteraction.processing_time
+    prompt_eval = func.sum(ChatInteraction.prompt_eval_duration)
+    generation = func.sum(ChatInteraction.eval_duration)
+
+    statement = select(
+        ChatInteraction.model_name,
+        func.count().label("requests"),
+        func.percentile_cont(0.5).within_group(latency).label("latency_p50"),
+        func.percentile_cont(0.95).within_group(latency).label("latency_p95"),
+        (func.sum(ChatInteraction.completion_tokens) / func.nullif(generation, 0)).label("tokens_per_second"),
+        (func.sum(ChatInteraction.prompt_tokens) / func.nullif(prompt_eval, 0)).label("prompt_tokens_per_second"),
+        func.avg(ChatInteraction.load_duration).label("avg_load_duration"),
+        func.max(ChatInteraction.load_duration).label("max_load_duration"),
+        func.sum(ChatInteraction.prompt_tokens).label("prompt_tokens"),
+        func.sum(ChatInteraction.completion_tokens).label("completion_tokens"),
+        prompt_eval.label("prompt_eval_duration"),
+        generation.label("eval_duration"),
+        (prompt_eval / func.nullif(prompt_eval + generation, 0)).label("prompt_eval_share"),
+    ).where(
+        ChatInteraction.status == "completed",
+        ChatInteraction.cached.is_(False),
+        ChatInteraction.created_at >= since,
+        ChatInteraction.created_at < until,
+    ).group_by(ChatInteraction.model_name).order_by(ChatInteraction.model_name)
+
+    if model_name:
+        statement = statement.where(ChatInteraction.model_name == model_name)
+
+    rows = db.exec(statement).all()
+    return UsageAnalyticsResponse(
+        since=since,
+        until=until,
+        models=[ModelUsageStats(**row._mapping) for row in rows]
+    )
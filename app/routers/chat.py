@@ -1,30 +1,114 @@
-from fastapi import APIRouter, HTTPException, Depends
-from pydantic import BaseModel
-from typing import List, Optional
-from sqlmodel import Session
-from ..agents.chat_agent import OllamaChatAgent
-from ..database import get_db
-from ..models.base import ChatInteraction
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Dict, List, Literal, Optional
+from datetime import datetime
+from sqlalchemy import Float, cast, insert, tuple_
+from sqlmodel import Session, select, func
+import anyio
+from ..database import get_db, new_session
+from ..models.base import ChatInteraction, SEARCH_CONFIG
+from .. import tracing
+import asyncio
+import base64
 import json
+import orjson
+import os
+import threading
 import time
 import uuid
 
 router = APIRouter()
 
-chat_agent = OllamaChatAgent()
+# Default deadline for a chat request in seconds; 0 disables it
+CHAT_REQUEST_TIMEOUT = float(os.getenv("CHAT_REQUEST_TIMEOUT", "300"))
+# How often an in-flight generation checks whether the client is still connected
+DISCONNECT_POLL_INTERVAL = float(os.getenv("CHAT_DISCONNECT_POLL_INTERVAL", "0.5"))
+# Allow requests to use the exact-match response cache (see ChatRequest.cache)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+# Parallel generations per /chat/batch request (default) and the most a request may ask for
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+CHAT_BATCH_MAX_CONCURRENCY = int(os.getenv("CHAT_BATCH_MAX_CONCURRENCY", "16"))
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "10000"))
+
+_chat_agent = None
+_chat_agent_lock = threading.Lock()
+
+def get_chat_agent():
+    """Build the chat agent on first use.
+
+    The agent module pulls in LangGraph/LangChain and its constructor queries
+    Ollama, so neither should happen when the application is imported. The lock
+    makes concurrent first requests share one agent (and its response cache).
+    """
+    global _chat_agent
+    if _chat_agent is None:
+        with _chat_agent_lock:
+            if _chat_agent is None:
+                from ..agents.chat_agent import OllamaChatAgent
+                _chat_agent = OllamaChatAgent()
+    return _chat_agent
 
 class ChatRequest(BaseModel):
     message: str
     model_name: str
     session_id: Optional[str] = None
+    temperature: Optional[float] = None
+    # None: cache only deterministic (temperature 0) requests; True/False forces it on/off
+    cache: Optional[bool] = None
+    # How much of the conversation to return: all of it, only this turn, or
+    # every turn from since_turn on. Long sessions should use "new" or "since".
+    history: Literal["full", "new", "since"] = "full"
+    since_turn: int = Field(default=0, ge=0)
+
+    def use_cache(self) -> bool:
+        if not RESPONSE_CACHE_ENABLED:
+            return False
+        if self.cache is not None:
+            return self.cache
+        return self.temperature == 0
+
+    def options(self) -> dict:
+        return {"temperature": self.temperature} if self.temperature is not None else {}
+
+    def history_start(self, turn_index: int) -> int:
+        """Index of the first turn to return, given the index of the turn just completed"""
+        if self.history == "new":
+            return turn_index
+        if self.history == "since":
+            return min(self.since_turn, turn_index)
+        return 0
 
 class ChatResponse(BaseModel):
     response: str
     error: str
     model_name: str
+    # Turns from history_start on (a turn is a user message and its reply)
     conversation_history: List[dict]
     session_id: str
     processing_time: float
+    tokens_used: Optional[int] = None
+    cache: Optional[str] = None
+    turn_index: Optional[int] = None
+    history_start: int = 0
+
+class ChatSearchHit(BaseModel):
+    id: int
+    session_id: str
+    model_name: str
+    user_message: str
+    ai_response: str
+    created_at: datetime
+    rank: float
+
+class ChatSearchResponse(BaseModel):
+    results: List[ChatSearchHit]
+    next_cursor: Optional[str] = None
+
+class BatchChatRequest(BaseModel):
+    items: List[ChatRequest] = Field(..., min_length=1, max_length=CHAT_BATCH_MAX_ITEMS)
+    concurrency: Optional[int] = Field(default=None, ge=1)
 
 class PullModelRequest(BaseModel):
     model: str
@@ -34,10 +118,85 @@ class PullModelResponse(BaseModel):
     model: str
     detail: Optional[dict] = None
 
+def load_conversation_history(db: Session, session_id: str) -> List[dict]:
+    """Rebuild the message history of a session from its completed interactions"""
+    statement = select(ChatInteraction.user_message, ChatInteraction.ai_response).where(
+        ChatInteraction.session_id == session_id,
+        ChatInteraction.status == "completed"
+    ).order_by(ChatInteraction.created_at)
+    
+    conversation_history = []
+    for interaction in db.exec(statement).all():
+        conversation_history.append({
+            "role": "user",
+            "content": interaction.user_message
+        })
+        conversation_history.append({
+            "role": "assistant", 
+            "content": interaction.ai_response
+        })
+    return conversation_history
+
+def save_interaction(db: Session, chat_interaction: ChatInteraction) -> ChatInteraction:
+    db.add(chat_interaction)
+    db.commit()
+    db.refresh(chat_interaction)
+    return chat_interaction
+
+def request_timeout(header_value: Optional[float]) -> Optional[float]:
+    """Deadline budget in seconds: CHAT_REQUEST_TIMEOUT, shortened by the X-Request-Timeout header.
+
+    The header can't extend or disable the server's deadline; non-positive values are ignored.
+    """
+    timeout = CHAT_REQUEST_TIMEOUT if CHAT_REQUEST_TIMEOUT > 0 else None
+    if header_value is not None and header_value > 0:
+        timeout = min(header_value, timeout) if timeout is not None else header_value
+    return timeout
+
+async def run_until_deadline(task: asyncio.Task, http_request: Request, deadline: Optional[float]) -> str:
+    """Wait for a generation task, cancelling it when the client disconnects or the deadline passes.
+
+    Returns "completed", "cancelled" or "timeout".
+    """
+    loop = asyncio.get_running_loop()
+    outcome = "completed"
+    try:
+        while not task.done():
+            wait_for = DISCONNECT_POLL_INTERVAL
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    outcome = "timeout"
+                    break
+                wait_for = min(wait_for, remaining)
+            
+            await asyncio.wait({task}, timeout=wait_for)
+            if not task.done() and await http_request.is_disconnected():
+                outcome = "cancelled"
+                break
+    finally:
+        if not task.done():
+            task.cancel()
+            # Let the cancellation unwind through LangGraph and close the Ollama stream
+            await asyncio.gather(task, return_exceptions=True)
+    return outcome
+
 @router.post("/", response_model=ChatResponse)
-def chat_with_model(request: ChatRequest, db: Session = Depends(get_db)):
-    """Chat with an Ollama model using LangGraph"""
-    start_time = time.time()
+async def chat_with_model(
+    request: ChatRequest,
+    http_request: Request,
+    db: Session = Depends(get_db),
+    chat_agent=Depends(get_chat_agent),
+    x_request_timeout: Optional[float] = Header(default=None, description="Deadline for this request in seconds")
+):
+    """Chat with an Ollama model using LangGraph.
+
+    The generation is cancelled, and Ollama stops generating, when the client
+    disconnects or the request deadline passes. Both are recorded with their own status.
+    """
+    loop = asyncio.get_running_loop()
+    timeout = request_timeout(x_request_timeout)
+    deadline = loop.time() + timeout if timeout is not None else None
     
     try:
         if not request.message.strip():
@@ -49,56 +208,69 @@ def chat_with_model(request: ChatRequest, db: Session = Depends(get_db)):
         if not request.session_id:
             request.session_id = str(uuid.uuid4())
         
-        conversation_history = []
-        if request.session_id:
-            from sqlmodel import select
-            statement = select(ChatInteraction).where(
-                ChatInteraction.session_id == request.session_id
-            ).order_by(ChatInteraction.created_at)
-            
-            previous_interactions = db.exec(statement).all()
-            
-            for interaction in previous_interactions:
-                conversation_history.append({
-                    "role": "user",
-                    "content": interaction.user_message
-                })
-                conversation_history.append({
-                    "role": "assistant", 
-                    "content": interaction.ai_response
-                })
+        with tracing.span("chat.load_history") as history_span:
+            conversation_history = await run_in_threadpool(load_conversation_history, db, request.session_id)
+            history_span.set_attribute("chat.history_messages", len(conversation_history))
         
-        result = chat_agent.chat(
-            message=request.message,
-            model_name=request.model_name,
-            conversation_history=conversation_history
-        )
+        # Only the agent call is timed so processing_time excludes DB work
+        start_time = time.time()
+        with tracing.span("chat.generate") as generate_span:
+            generation = asyncio.ensure_future(chat_agent.achat(
+                message=request.message,
+                model_name=request.model_name,
+                conversation_history=conversation_history,
+                options=request.options(),
+                use_cache=request.use_cache()
+            ))
+            outcome = await run_until_deadline(generation, http_request, deadline)
+            generate_span.set_attribute("chat.outcome", outcome)
+        processing_time = time.time() - start_time
+        
+        if outcome != "completed":
+            error = (
+                f"Request deadline of {timeout}s exceeded" if outcome == "timeout"
+                else "Client disconnected before the response was ready"
+            )
+            await run_in_threadpool(save_interaction, db, ChatInteraction(
+                session_id=request.session_id,
+                model_name=request.model_name,
+                user_message=request.message,
+                ai_response="",
+                status=outcome,
+                processing_time=processing_time,
+                error_message=error
+            ))
+            raise HTTPException(status_code=504 if outcome == "timeout" else 499, detail=error)
         
+        result = generation.result()
         if result.get("error"):
             raise HTTPException(status_code=400, detail=result["error"])
         
-        processing_time = time.time() - start_time
-        
-        chat_interaction = ChatInteraction(
-            session_id=request.session_id,
-            model_name=result["model_name"],
-            user_message=request.message,
-            ai_response=result["response"],
-            conversation_history=json.dumps(result["conversation_history"]),
-            processing_time=processing_time
-        )
-        
-        db.add(chat_interaction)
-        db.commit()
-        db.refresh(chat_interaction)
+        with tracing.span("chat.save_interaction"):
+            chat_interaction = await run_in_threadpool(save_interaction, db, ChatInteraction(
+                session_id=request.session_id,
+                model_name=result["model_name"],
+                user_message=request.message,
+                ai_response=result["response"],
+                conversation_history=orjson.dumps(result["conversation_history"]).decode(),
+                processing_time=processing_time,
+                cached=result.get("cache") in ("hit", "coalesced", "semantic"),
+                **result["metrics"]
+            ))
         
+        turn_index = len(conversation_history) // 2
+        history_start = request.history_start(turn_index)
         return ChatResponse(
             response=result["response"],
             error=result.get("error", ""),
             model_name=result["model_name"],
-            conversation_history=result["conversation_history"],
+            conversation_history=result["conversation_history"][2 * history_start:],
             session_id=chat_interaction.session_id,
-            processing_time=processing_time
+            processing_time=processing_time,
+            tokens_used=chat_interaction.tokens_used,
+            cache=result.get("cache"),
+            turn_index=turn_index,
+            history_start=history_start
         )
         
     except HTTPException:
@@ -106,8 +278,213 @@ def chat_with_model(request: ChatRequest, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat processing failed: {str(e)}")
 
+def encode_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/search", response_model=ChatSearchResponse)
+def search_chat_history(
+    q: str = Query(..., min_length=1, description="Search terms (web search syntax: quotes, OR, -exclude)"),
+    model_name: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    sort: Literal["rank", "recent"] = "rank",
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over chat history using the indexed search_vector column.
+
+    Results are keyset-paginated: pass next_cursor back as cursor to get the next page.
+    """
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    rank = cast(func.ts_rank_cd(ChatInteraction.search_vector, query), Float)
+    
+    statement = select(
+        ChatInteraction.id,
+        ChatInteraction.session_id,
+        ChatInteraction.model_name,
+        ChatInteraction.user_message,
+        ChatInteraction.ai_response,
+        ChatInteraction.created_at,
+        rank.label("rank")
+    ).where(
+        ChatInteraction.search_vector.op("@@")(query),
+        ChatInteraction.status == "completed"
+    )
+    
+    if model_name:
+        statement = statement.where(ChatInteraction.model_name == model_name)
+    if session_id:
+        statement = statement.where(ChatInteraction.session_id == session_id)
+    if since:
+        statement = statement.where(ChatInteraction.created_at >= since)
+    if until:
+        statement = statement.where(ChatInteraction.created_at < until)
+    
+    sort_key = rank if sort == "rank" else ChatInteraction.created_at
+    if cursor:
+        last_key, last_id = decode_cursor(cursor)
+        if sort == "recent":
+            last_key = datetime.fromisoformat(last_key)
+        statement = statement.where(tuple_(sort_key, ChatInteraction.id) < tuple_(last_key, last_id))
+    
+    statement = statement.order_by(sort_key.desc(), ChatInteraction.id.desc()).limit(limit + 1)
+    rows = db.exec(statement).all()
+    
+    hits = [ChatSearchHit(**row._mapping) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = hits[-1]
+        next_cursor = encode_cursor(last.rank if sort == "rank" else last.created_at.isoformat(), last.id)
+    
+    return ChatSearchResponse(results=hits, next_cursor=next_cursor)
+
+def load_conversation_histories(session_ids: List[str]) -> Dict[str, List[dict]]:
+    """Message histories of many sessions with a single query"""
+    histories = {session_id: [] for session_id in session_ids}
+    statement = select(
+        ChatInteraction.session_id, ChatInteraction.user_message, ChatInteraction.ai_response
+    ).where(
+        ChatInteraction.session_id.in_(session_ids),
+        ChatInteraction.status == "completed"
+    ).order_by(ChatInteraction.session_id, ChatInteraction.created_at)
+    
+    with new_session() as db:
+        for interaction in db.exec(statement).all():
+            histories[interaction.session_id].append({"role": "user", "content": interaction.user_message})
+            histories[interaction.session_id].append({"role": "assistant", "content": interaction.ai_response})
+    return histories
+
+def bulk_save_interactions(rows: List[dict]):
+    with new_session() as db:
+        db.exec(insert(ChatInteraction), params=rows)
+        db.commit()
+
+async def run_chat_batch(chat_agent, items: List[ChatRequest], histories: Dict[str, List[dict]],
+                         concurrency: int) -> AsyncIterator[bytes]:
+    """Yield one NDJSON line per item as it finishes, then a summary line.
+
+    Items are processed one model at a time, so Ollama swaps models as rarely as
+    possible, with at most `concurrency` generations in flight. A failing item
+    is reported on its own line and does not stop the others. Successful
+    results are persisted with a single bulk insert at the end, or when the
+    client disconnects.
+    """
+    by_model: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        by_model.setdefault(item.model_name, []).append(index)
+    
+    rows, failed, persisted = [], 0, False
+    pending = set()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def run_item(index: int, history: List[dict]):
+        item = items[index]
+        async with semaphore:
+            start_time = time.time()
+            try:
+                if not item.message.strip():
+                    raise ValueError("Message cannot be empty")
+                result = await chat_agent.achat(
+                    message=item.message,
+                    model_name=item.model_name,
+                    conversation_history=history,
+                    options=item.options(),
+                    use_cache=item.use_cache()
+                )
+            except Exception as e:
+                result = {"error": str(e), "response": "", "model_name": item.model_name}
+            return index, result, time.time() - start_time
+    
+    try:
+        for model_name, indexes in by_model.items():
+            pending = {
+                asyncio.ensure_future(run_item(index, histories[items[index].session_id]))
+                for index in indexes
+            }
+            for next_done in asyncio.as_completed(pending):
+                index, result, processing_time = await next_done
+                item = items[index]
+                metrics = result.get("metrics") or {}
+                if result.get("error"):
+                    failed += 1
+                else:
+                    rows.append({
+                        "session_id": item.session_id,
+                        "model_name": result["model_name"],
+                        "user_message": item.message,
+                        "ai_response": result["response"],
+                        "conversation_history": orjson.dumps(result["conversation_history"]).decode(),
+                        "processing_time": processing_time,
+                        "cached": result.get("cache") in ("hit", "coalesced", "semantic"),
+                        **metrics
+                    })
+                yield orjson.dumps({
+                    "index": index,
+                    "session_id": item.session_id,
+                    "model_name": item.model_name,
+                    "response": result.get("response", ""),
+                    "error": result.get("error", ""),
+                    "processing_time": processing_time,
+                    "tokens_used": metrics.get("tokens_used"),
+                    "cache": result.get("cache")
+                }) + b"\n"
+        
+        persist_error = None
+        if rows:
+            try:
+                with tracing.span("chat_batch.bulk_insert", **{"db.rows": len(rows)}):
+                    await run_in_threadpool(bulk_save_interactions, rows)
+            except Exception as e:
+                persist_error = str(e)
+        persisted = True
+        
+        yield orjson.dumps({"summary": {
+            "total": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "persisted": 0 if persist_error else len(rows),
+            "persist_error": persist_error
+        }}) + b"\n"
+    finally:
+        for task in pending:
+            task.cancel()
+        if rows and not persisted:
+            # Client went away: keep what finished. Shielded because the
+            # surrounding scope is already cancelled.
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(bulk_save_interactions, rows)
+
+@router.post("/batch")
+async def chat_batch(batch: BatchChatRequest, chat_agent=Depends(get_chat_agent)):
+    """Run many independent prompts and stream the results back as NDJSON as they finish"""
+    concurrency = min(batch.concurrency or CHAT_BATCH_CONCURRENCY, CHAT_BATCH_MAX_CONCURRENCY)
+    for item in batch.items:
+        item.session_id = item.session_id or str(uuid.uuid4())
+    
+    # Loaded before the response starts, so a failure is still a proper error status
+    try:
+        with tracing.span("chat_batch.load_histories"):
+            histories = await run_in_threadpool(
+                load_conversation_histories, list({item.session_id for item in batch.items})
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load conversation histories: {str(e)}")
+    
+    return StreamingResponse(
+        run_chat_batch(chat_agent, batch.items, histories, concurrency),
+        media_type="application/x-ndjson"
+    )
+
 @router.get("/health")
-def chat_health_check():
+def chat_health_check(chat_agent=Depends(get_chat_agent)):
     """Health check for the chat service"""
     try:
         models = chat_agent.get_available_models()
@@ -124,13 +501,13 @@ def chat_health_check():
         }
 
 @router.post("/models/reload")
-def reload_available_models():
+def reload_available_models(chat_agent=Depends(get_chat_agent)):
     """Reload available Ollama models after initialization"""
     chat_agent._load_available_models()
     return {"models": chat_agent.get_available_models()}
 
 @router.post("/models/pull", response_model=PullModelResponse)
-def pull_model(body: PullModelRequest):
+def pull_model(body: PullModelRequest, chat_agent=Depends(get_chat_agent)):
     """Pull an Ollama model by name (e.g., "llama3.1:8b")."""
     import httpx
     try:
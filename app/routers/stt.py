@@ -1,10 +1,18 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-import whisper
+from functools import lru_cache
+import anyio.to_thread
 import tempfile
 import os
 import logging
+import threading
 from typing import Optional
+from .. import tracing
+from ..speech.audio import load_audio
+from ..speech.engines import ENGINES, get_engine_class
+from ..speech.pool import PoolCache, TranscriptionPool
+from ..speech.vad import SAMPLE_RATE, response_segments
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,13 +20,105 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Recordings at least this long are split at pauses and transcribed in parallel
+STT_CHUNK_MIN_SECONDS = float(os.getenv("STT_CHUNK_MIN_SECONDS", "60"))
+STT_MAX_CHUNK_SECONDS = float(os.getenv("STT_MAX_CHUNK_SECONDS", "30"))
+# Worker processes for chunked transcription; each holds its own copy of the model
+STT_WORKERS = int(os.getenv("STT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Engine used when a request doesn't name one: "whisper" (GPU if available, fp32 on CPU)
+# or "whisper-cpu" (int8 dynamic quantization, falls back to fp32)
+STT_ENGINE = os.getenv("STT_ENGINE", "whisper")
+# "int8" or "none"; only used by the whisper-cpu engine
+STT_QUANTIZATION = os.getenv("STT_QUANTIZATION", "int8")
+# Torch threads per worker (intra-op defaults to cpu_count / STT_WORKERS) and for
+# short recordings transcribed in the API process (intra-op defaults to torch's own)
+STT_INTRA_OP_THREADS = int(os.getenv("STT_INTRA_OP_THREADS", "0")) or None
+STT_INTER_OP_THREADS = int(os.getenv("STT_INTER_OP_THREADS", "1"))
+# Worker pools kept alive for different engine/model pairs; each holds STT_WORKERS model copies
+STT_MAX_POOLS = int(os.getenv("STT_MAX_POOLS", "2"))
+# Short recordings transcribed at once in the API process; more would only split the same cores
+STT_INPROCESS_CONCURRENCY = int(os.getenv("STT_INPROCESS_CONCURRENCY", "1"))
+
+# Created on first use, inside the event loop. Its own threads, so requests waiting for a
+# slot wait in the event loop instead of holding threads of the default pool used by chat and DB calls
+_inprocess_limiter: Optional[anyio.CapacityLimiter] = None
+# lru_cache doesn't serialize misses; without this, concurrent first requests would each load the model
+_engine_lock = threading.Lock()
+
+def inprocess_limiter() -> anyio.CapacityLimiter:
+    global _inprocess_limiter
+    if _inprocess_limiter is None:
+        _inprocess_limiter = anyio.CapacityLimiter(STT_INPROCESS_CONCURRENCY)
+    return _inprocess_limiter
+
+def engine_options(engine: str) -> dict:
+    return {"quantization": STT_QUANTIZATION} if engine == "whisper-cpu" else {}
+
+@lru_cache(maxsize=1)
+def gpu_available() -> bool:
+    """Imports torch on the first call, so call it from a worker thread before pools.acquire"""
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+@lru_cache(maxsize=2)
+def get_engine(engine: str, name: str):
+    """Engine for short recordings, loaded in this process on first use; whisper pulls in torch"""
+    return get_engine_class(engine)(
+        name, threads=STT_INTRA_OP_THREADS, interop_threads=STT_INTER_OP_THREADS, **engine_options(engine)
+    )
+
+def create_transcription_pool(key) -> TranscriptionPool:
+    engine, name = key
+    # Chunks of a GPU model run on one worker rather than put a model copy per worker on the GPU
+    workers = 1 if engine == "whisper" and gpu_available() else STT_WORKERS
+    return TranscriptionPool(
+        name, workers, engine=engine, max_chunk_seconds=STT_MAX_CHUNK_SECONDS,
+        threads=STT_INTRA_OP_THREADS, interop_threads=STT_INTER_OP_THREADS, **engine_options(engine),
+    )
+
+pools = PoolCache(create_transcription_pool, STT_MAX_POOLS)
+
+async def transcribe_chunked(audio, engine: str, model: str, language: Optional[str]) -> dict:
+    """Split at pauses, drop the silence and transcribe the chunks across the worker pool"""
+    if engine == "whisper":
+        # acquire runs on the event loop and may create the pool; keep the torch import off it
+        await run_in_threadpool(gpu_available)
+    with pools.acquire((engine, model)) as pool:
+        with tracing.span("stt.vad") as vad_span:
+            chunks = await run_in_threadpool(pool.plan, audio)
+            vad_span.set_attribute("stt.chunks", len(chunks))
+        with tracing.span("stt.transcribe_chunks", **{"stt.workers": pool.workers}):
+            result = await pool.transcribe(audio, chunks, language)
+        result["engine"] = await pool.info()
+    result["chunks"] = len(chunks)
+    result["speech_duration"] = sum(chunk.samples for chunk in chunks) / SAMPLE_RATE
+    return result
+
+def transcribe_whole(audio, engine: str, model: str, language: Optional[str]) -> dict:
+    """Transcribe in this process; the endpoint runs it on an inprocess_limiter() thread"""
+    with tracing.span("stt.load_model", **{"stt.engine": engine, "stt.model": model}), _engine_lock:
+        stt_engine = get_engine(engine, model)
+    with tracing.span("stt.transcribe"):
+        result = stt_engine.transcribe(audio, language)
+    result["segments"] = response_segments(result["segments"])
+    result["engine"] = stt_engine.info()
+    result["chunks"] = 1
+    result["speech_duration"] = len(audio) / SAMPLE_RATE
+    return result
+
 model_choices = Query(default="turbo", description="Model to use for transcription", choices=["tiny", "base", "small", "medium", "large", "turbo"])
 
 @router.post("/transcribe")
 async def transcribe_audio(
     audio_file: UploadFile = File(..., description="Audio file to transcribe"),
     model: str = model_choices,
-    language: Optional[str] = None
+    language: Optional[str] = None,
+    chunked: Optional[bool] = Query(default=None, description="Split at pauses and transcribe in parallel (default: for recordings of STT_CHUNK_MIN_SECONDS or more)"),
+    engine: Optional[str] = Query(default=None, description="STT engine (default: STT_ENGINE)")
 ):
     """
     Transcribe audio file to text using OpenAI Whisper.
@@ -26,9 +126,11 @@ async def transcribe_audio(
     Args:
         audio_file: Audio file upload (supports wav, mp3, m4a, flac, etc.)
         language: Language code for transcription (optional, auto-detected if not provided)
+        chunked: Use the parallel pipeline, which skips silence
+        engine: Inference backend, e.g. "whisper-cpu" for int8 on CPU
     
     Returns:
-        JSON response with transcribed text and metadata
+        JSON response with transcribed text, timestamped segments and metadata
     """
     try:
         if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
@@ -37,6 +139,13 @@ async def transcribe_audio(
                 detail="File must be an audio file"
             )
         
+        engine = engine or STT_ENGINE
+        if engine not in ENGINES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown engine '{engine}'. Available: {', '.join(ENGINES)}"
+            )
+        
         audio_content = await audio_file.read()
         
         with tempfile.NamedTemporaryFile(delete=False, suffix=f".{audio_file.filename.split('.')[-1] if '.' in audio_file.filename else 'wav'}") as temp_file:
@@ -44,25 +153,35 @@ async def transcribe_audio(
             temp_file_path = temp_file.name
         
         try:
-            logger.info("Loading Whisper model...")
-            model = whisper.load_model(model)
+            with tracing.span("stt.decode", **{"stt.audio_bytes": len(audio_content)}):
+                audio = await run_in_threadpool(load_audio, temp_file_path)
+            os.unlink(temp_file_path)
+            duration = len(audio) / SAMPLE_RATE
             
-            logger.info("Transcribing audio...")
-            if language:
-                result = model.transcribe(temp_file_path, language=language)
+            use_chunks = chunked if chunked is not None else duration >= STT_CHUNK_MIN_SECONDS
+            if use_chunks:
+                logger.info(f"Transcribing {duration:.0f}s of audio in parallel chunks...")
+                result = await transcribe_chunked(audio, engine, model, language)
             else:
-                result = model.transcribe(temp_file_path)
-            
-            os.unlink(temp_file_path)
+                logger.info("Transcribing audio...")
+                result = await anyio.to_thread.run_sync(
+                    transcribe_whole, audio, engine, model, language, limiter=inprocess_limiter()
+                )
             
             return JSONResponse(
                 content={
                     "success": True,
                     "transcribed_text": result["text"].strip(),
-                    "language": result.get("language", "auto-detected"),
+                    "language": result.get("language") or "auto-detected",
+                    "segments": result["segments"],
+                    "duration": round(duration, 3),
+                    "speech_duration": round(result["speech_duration"], 3),
+                    "chunks": result["chunks"],
                     "file_name": audio_file.filename,
                     "file_size": len(audio_content),
-                    "model_used": "whisper-base"
+                    "model_used": f"whisper-{model}",
+                    "engine": result["engine"]["engine"],
+                    "precision": result["engine"]["precision"]
                 },
                 status_code=200
             )
@@ -91,11 +210,13 @@ async def stt_health_check():
     Health check for STT service.
     """
     try:
-        model = whisper.load_model("tiny")
+        if not get_engine_class(STT_ENGINE).available():
+            raise RuntimeError(f"Dependencies of the {STT_ENGINE} engine are not installed")
         return {
             "service": "stt",
             "status": "healthy",
             "whisper_available": True,
+            "engine": STT_ENGINE,
             "message": "STT service is ready with Whisper"
         }
     except Exception as e:
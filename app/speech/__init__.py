@@ -0,0 +1 @@
+# Speech Package
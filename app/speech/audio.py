@@ -0,0 +1,41 @@
+from .vad import SAMPLE_RATE
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+
+
+def load_audio(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode any audio file to mono float32 at sample_rate with ffmpeg, as Whisper does.
+
+    Without ffmpeg on the PATH, only PCM WAV files can be read.
+    """
+    if shutil.which("ffmpeg") is None:
+        return read_wav(path, sample_rate)
+
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='replace')}") from e
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def read_wav(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Read a 16-bit PCM WAV file as mono float32, resampled linearly to sample_rate"""
+    with wave.open(path, "rb") as wav:
+        if wav.getsampwidth() != 2:
+            raise RuntimeError("Only 16-bit PCM WAV can be decoded without ffmpeg")
+        channels = wav.getnchannels()
+        source_rate = wav.getframerate()
+        pcm = np.frombuffer(wav.readframes(wav.getnframes()), np.int16)
+
+    audio = pcm.reshape(-1, channels).mean(axis=1).astype(np.float32) / 32768.0
+    if source_rate != sample_rate and len(audio):
+        target = np.arange(int(len(audio) * sample_rate / source_rate)) * (source_rate / sample_rate)
+        audio = np.interp(target, np.arange(len(audio)), audio).astype(np.float32)
+    return audio
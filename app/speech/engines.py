@@ -0,0 +1,194 @@
+"""
+Speech-to-text engines behind /stt/transcribe.
+
+An engine wraps one loaded model and transcribes 16 kHz mono float32 audio.
+Engines are created by name from ENGINES, inside the transcription worker
+processes (see pool.py), so each worker holds one engine:
+    whisper      openai-whisper as shipped: GPU if available, else fp32 CPU
+    whisper-cpu  CPU-only Whisper with int8 dynamic quantization of the Linear
+                 layers (the bulk of the compute) and explicit torch thread
+                 counts; falls back to fp32 when quantization is unsupported
+torch and whisper are imported when an engine is created, not when this
+module is imported.
+"""
+
+from typing import Any, Dict, Optional, Type
+import importlib.util
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class STTEngine:
+    """Base class: subclasses load their model in __init__ and implement _transcribe"""
+
+    name = ""
+    requires = ()  # modules that must be importable for the engine to work
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, interop_threads: Optional[int] = None):
+        self.model_name = model_name
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.device = "cpu"
+        self.precision = "fp32"
+
+    @classmethod
+    def available(cls) -> bool:
+        return all(importlib.util.find_spec(module) is not None for module in cls.requires)
+
+    def _transcribe(self, audio: np.ndarray, language: Optional[str]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def transcribe(self, audio: np.ndarray, language: Optional[str] = None) -> Dict[str, Any]:
+        """Text, language and [{start, end, text}] segments, times relative to the audio"""
+        result = self._transcribe(audio, language)
+        return {
+            "text": result.get("text", ""),
+            "language": result.get("language"),
+            "segments": [
+                {"start": float(s["start"]), "end": float(s["end"]), "text": s["text"]}
+                for s in result.get("segments", [])
+            ],
+        }
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "engine": self.name,
+            "model": self.model_name,
+            "device": self.device,
+            "precision": self.precision,
+            "threads": self.threads,
+            "interop_threads": self.interop_threads,
+        }
+
+
+def configure_torch_threads(threads: Optional[int], interop_threads: Optional[int]):
+    """Apply per-process torch thread counts; inter-op threads can only be set before first use"""
+    import torch
+
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+
+class WhisperEngine(STTEngine):
+    name = "whisper"
+    requires = ("whisper", "torch")
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, interop_threads: Optional[int] = None):
+        super().__init__(model_name, threads, interop_threads)
+        import whisper
+
+        configure_torch_threads(threads, interop_threads)
+        self.model = whisper.load_model(model_name)
+        self.device = self.model.device.type
+        self.precision = "fp16" if self.device == "cuda" else "fp32"
+
+    def _transcribe(self, audio, language):
+        options = {"language": language} if language else {}
+        return self.model.transcribe(audio, fp16=self.precision == "fp16", **options)
+
+
+def replace_whisper_linear(module):
+    """Swap whisper's Linear subclass for torch.nn.Linear, sharing the weights.
+
+    quantize_dynamic matches module types exactly, so whisper.model.Linear
+    (which only adds dtype casting in forward) would otherwise stay fp32.
+    """
+    from torch import nn
+    from whisper.model import Linear as WhisperLinear
+
+    for name, child in module.named_children():
+        if type(child) is WhisperLinear:
+            linear = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            replace_whisper_linear(child)
+    return module
+
+
+def quantize_int8(model):
+    """int8 dynamic quantization of all Linear layers; raises if the platform has no quantized backend"""
+    import torch
+    from torch import nn
+
+    supported = torch.backends.quantized.supported_engines
+    if torch.backends.quantized.engine == "none":
+        backend = next((e for e in ("x86", "fbgemm", "qnnpack") if e in supported), None)
+        if backend is None:
+            raise RuntimeError(f"No quantized backend available (supported: {supported})")
+        torch.backends.quantized.engine = backend
+
+    quantized = torch.ao.quantization.quantize_dynamic(
+        replace_whisper_linear(model), {nn.Linear}, dtype=torch.qint8
+    )
+    _smoke_test(quantized)
+    return quantized
+
+
+def _smoke_test(model):
+    """One encoder pass and one decoder step, so unsupported kernels fail at load rather than mid-request"""
+    import torch
+    import whisper
+
+    mel = whisper.log_mel_spectrogram(np.zeros(whisper.audio.N_SAMPLES, dtype=np.float32), model.dims.n_mels)
+    with torch.no_grad():
+        features = model.embed_audio(mel[None])
+        model.logits(torch.zeros((1, 1), dtype=torch.long), features)
+
+
+def quantize_or_fallback(model, quantization: str):
+    """(model, precision): the int8 model when requested and supported, else the fp32 one"""
+    if quantization != "int8":
+        return model, "fp32"
+    try:
+        return quantize_int8(model), "int8"
+    except Exception as e:
+        logger.warning(f"int8 quantization not supported here, using fp32: {str(e)}")
+        return None, "fp32"
+
+
+class CPUWhisperEngine(WhisperEngine):
+    name = "whisper-cpu"
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, interop_threads: Optional[int] = None,
+                 quantization: str = "int8"):
+        STTEngine.__init__(self, model_name, threads, interop_threads)
+        import whisper
+
+        configure_torch_threads(threads, interop_threads)
+        model, self.precision = quantize_or_fallback(whisper.load_model(model_name, device="cpu"), quantization)
+        if model is None:
+            # A failed quantization may have modified the model in place; start from clean weights
+            model = whisper.load_model(model_name, device="cpu")
+        self.model = model.eval()
+        self.device = "cpu"
+
+    def _transcribe(self, audio, language):
+        options = {"language": language} if language else {}
+        return self.model.transcribe(audio, fp16=False, **options)
+
+
+ENGINES: Dict[str, Type[STTEngine]] = {
+    WhisperEngine.name: WhisperEngine,
+    CPUWhisperEngine.name: CPUWhisperEngine,
+}
+
+
+def register_engine(name: str, engine: Type[STTEngine]):
+    """Make an engine selectable by name; it must be importable by worker processes"""
+    ENGINES[name] = engine
+
+
+def get_engine_class(name: str) -> Type[STTEngine]:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown STT engine {name!r}. Available: {', '.join(ENGINES)}")
+    return ENGINES[name]
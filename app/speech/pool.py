@@ -0,0 +1,146 @@
+"""
+Parallel transcription of long recordings.
+
+The recording is split at pauses (see vad.py) and the chunks are transcribed
+concurrently by a pool of worker processes. Each worker creates its STT
+engine (see engines.py) once when it starts. Workers are started with
+"spawn", so they don't inherit the server's threads and sockets, and torch in
+each worker gets an equal share of the cores unless the thread counts are set
+explicitly.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, Iterator, Optional, Type
+import asyncio
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+
+from .engines import STTEngine, get_engine_class
+from .vad import SAMPLE_RATE, detect_speech, plan_chunks, response_segments, stitch
+
+_worker_engine = None
+
+
+def _init_worker(engine_class: Type[STTEngine], model_name: str, options: dict):
+    global _worker_engine
+    # Must be set before torch is imported to size its OpenMP pool
+    os.environ["OMP_NUM_THREADS"] = str(options["threads"])
+    _worker_engine = engine_class(model_name, **options)
+
+
+def _transcribe_chunk(audio: np.ndarray, language: Optional[str]) -> dict:
+    return _worker_engine.transcribe(audio, language)
+
+
+def _engine_info() -> dict:
+    return _worker_engine.info()
+
+
+class TranscriptionPool:
+    """Worker processes that each hold one instance of an STT engine"""
+
+    def __init__(self, model_name: str, workers: int, engine: str = "whisper", max_chunk_seconds: float = 30.0,
+                 threads: Optional[int] = None, interop_threads: Optional[int] = 1, **engine_options):
+        self.model_name = model_name
+        self.engine = engine
+        self.workers = workers
+        self.max_chunk_seconds = max_chunk_seconds
+        # Intra-op threads default to an equal share of the cores, so busy workers don't oversubscribe them
+        options = {
+            "threads": threads or max(1, (os.cpu_count() or 1) // workers),
+            "interop_threads": interop_threads,
+            **engine_options,
+        }
+        self._info = None
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(get_engine_class(engine), model_name, options),
+        )
+
+    async def info(self) -> dict:
+        """Engine, model, precision and thread settings as reported by a worker"""
+        if self._info is None:
+            loop = asyncio.get_running_loop()
+            self._info = await loop.run_in_executor(self.executor, _engine_info)
+        return self._info
+
+    def plan(self, audio: np.ndarray):
+        """Speech chunks of the recording; runs in the caller's process"""
+        return plan_chunks(audio, detect_speech(audio, SAMPLE_RATE), SAMPLE_RATE, self.max_chunk_seconds)
+
+    async def transcribe(self, audio: np.ndarray, chunks, language: Optional[str] = None) -> dict:
+        """Transcribe planned chunks concurrently and stitch them with source timestamps"""
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _transcribe_chunk, chunk.audio(audio), language)
+            for chunk in chunks
+        ))
+        return stitch(chunks, results, SAMPLE_RATE)
+
+    async def transcribe_whole(self, audio: np.ndarray, language: Optional[str] = None) -> dict:
+        """Transcribe the recording in one call on one worker"""
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, _transcribe_chunk, audio, language)
+        result["segments"] = response_segments(result["segments"])
+        return result
+
+    def shutdown(self):
+        """Stop the workers once the work already submitted has finished"""
+        self.executor.shutdown(wait=False)
+
+
+class PoolCache:
+    """The most recently used pools, keyed by e.g. (engine, model).
+
+    A pool pushed out to make room for another is retired: it gets no new
+    requests and shuts down when the requests already using it are done, so
+    switching models never cancels anyone's transcription.
+    """
+
+    def __init__(self, factory: Callable[[Hashable], TranscriptionPool], max_pools: int = 2):
+        self.factory = factory
+        self.max_pools = max(1, max_pools)
+        self._pools: "OrderedDict[Hashable, TranscriptionPool]" = OrderedDict()
+        self._users: Dict[TranscriptionPool, int] = {}
+        self._retired = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, key: Hashable) -> Iterator[TranscriptionPool]:
+        """Use the pool for key, creating it (and retiring the least recently used one) if needed"""
+        with self._lock:
+            pool = self._pools.pop(key, None) or self.factory(key)
+            self._pools[key] = pool
+            self._users[pool] = self._users.get(pool, 0) + 1
+            while len(self._pools) > self.max_pools:
+                _, evicted = self._pools.popitem(last=False)
+                self._retire(evicted)
+        try:
+            yield pool
+        finally:
+            with self._lock:
+                self._users[pool] -= 1
+                if not self._users[pool]:
+                    del self._users[pool]
+                    if pool in self._retired:
+                        self._retired.discard(pool)
+                        pool.shutdown()
+
+    def _retire(self, pool: TranscriptionPool):
+        if pool in self._users:
+            self._retired.add(pool)
+        else:
+            pool.shutdown()
+
+    def close(self):
+        """Retire every pool; busy ones stop after their current requests"""
+        with self._lock:
+            while self._pools:
+                self._retire(self._pools.popitem()[1])
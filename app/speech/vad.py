@@ -0,0 +1,172 @@
+"""
+Energy-based voice activity detection and chunk planning for long recordings.
+
+Audio is 16 kHz mono float32, as Whisper expects. Silence is found from
+per-frame RMS energy, computed for the whole recording at once with NumPy.
+Speech regions are then packed into chunks of at most `max_chunk_seconds`,
+Whisper's 30 s window, with the silence between them left out. Each chunk
+keeps the source position of every piece, so timestamps inside a chunk can
+be mapped back to the original recording.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def frame_energy_db(audio: np.ndarray, frame_length: int) -> np.ndarray:
+    """RMS energy in dBFS of consecutive frames (the last one zero-padded)"""
+    frames = -(-len(audio) // frame_length)
+    padded = np.zeros(frames * frame_length, dtype=np.float32)
+    padded[:len(audio)] = audio
+    rms = np.sqrt(np.mean(np.square(padded.reshape(frames, frame_length)), axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def speech_threshold_db(energy: np.ndarray, floor_db: float = -50.0, margin_db: float = 10.0) -> float:
+    """Adaptive threshold: `margin_db` above the noise floor, but never so high
+    that recordings without pauses lose their quieter speech, and never below `floor_db`
+    """
+    noise = np.percentile(energy, 10)
+    peak = np.percentile(energy, 99)
+    return float(max(floor_db, min(noise + margin_db, peak - 25.0)))
+
+
+def detect_speech(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_ms: int = 30,
+                  threshold_db: Optional[float] = None, min_silence_ms: int = 500,
+                  min_speech_ms: int = 200, pad_ms: int = 200) -> np.ndarray:
+    """Speech regions as an (n, 2) array of [start, end) sample indices.
+
+    Pauses shorter than `min_silence_ms` are kept inside a region, bursts
+    shorter than `min_speech_ms` are dropped, and every region is widened by
+    `pad_ms` so word onsets and tails are not clipped.
+    """
+    if len(audio) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    frame_length = sample_rate * frame_ms // 1000
+    energy = frame_energy_db(audio, frame_length)
+    if threshold_db is None:
+        threshold_db = speech_threshold_db(energy)
+
+    # Run boundaries of the speech mask: +1 where speech starts, -1 where it ends
+    edges = np.diff(np.concatenate(([0], (energy > threshold_db).astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Bridge short pauses
+    keep_gap = (starts[1:] - ends[:-1]) * frame_ms >= min_silence_ms
+    starts = np.concatenate((starts[:1], starts[1:][keep_gap]))
+    ends = np.concatenate((ends[:-1][keep_gap], ends[-1:]))
+
+    # Drop clicks and other short bursts
+    long_enough = (ends - starts) * frame_ms >= min_speech_ms
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    pad = sample_rate * pad_ms // 1000
+    regions = np.stack((starts * frame_length - pad, ends * frame_length + pad), axis=1)
+    return np.clip(regions, 0, len(audio)).astype(np.int64)
+
+
+@dataclass
+class Chunk:
+    """Speech pieces of the source recording, transcribed as one Whisper call"""
+    pieces: List[Tuple[int, int]] = field(default_factory=list)  # [start, end) source samples
+
+    @property
+    def samples(self) -> int:
+        return sum(end - start for start, end in self.pieces)
+
+    def audio(self, source: np.ndarray) -> np.ndarray:
+        return np.concatenate([source[start:end] for start, end in self.pieces])
+
+    def source_time(self, seconds: float, sample_rate: int = SAMPLE_RATE, end: bool = False) -> float:
+        """Map a time within the chunk audio to a time in the source recording.
+
+        A time exactly on the boundary between two pieces is the start of the
+        later piece, or with end=True the end of the earlier one, so a segment
+        ending there doesn't stretch across the silence that was cut out.
+        """
+        lengths = np.array([stop - start for start, stop in self.pieces])
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        position = min(max(seconds * sample_rate, 0), offsets[-1])
+        index = int(np.searchsorted(offsets, position, side="left" if end else "right")) - 1
+        piece = min(max(index, 0), len(self.pieces) - 1)
+        return (self.pieces[piece][0] + position - offsets[piece]) / sample_rate
+
+
+def _split_long_region(energy: np.ndarray, frame_length: int, start: int, end: int,
+                       max_samples: int, search_samples: int) -> List[Tuple[int, int]]:
+    """Cut a region longer than max_samples at its quietest frame near each limit"""
+    pieces = []
+    while end - start > max_samples:
+        window_start = (start + max_samples - search_samples) // frame_length
+        window_end = max(window_start + 1, (start + max_samples) // frame_length)
+        cut = (window_start + int(np.argmin(energy[window_start:window_end]))) * frame_length
+        cut = min(max(cut, start + frame_length), start + max_samples)
+        pieces.append((start, cut))
+        start = cut
+    pieces.append((start, end))
+    return pieces
+
+
+def plan_chunks(audio: np.ndarray, regions: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                max_chunk_seconds: float = 30.0, frame_ms: int = 30) -> List[Chunk]:
+    """Pack speech regions, in order, into chunks of at most max_chunk_seconds"""
+    max_samples = int(max_chunk_seconds * sample_rate)
+    frame_length = sample_rate * frame_ms // 1000
+    energy = frame_energy_db(audio, frame_length)
+
+    chunks: List[Chunk] = []
+    current = Chunk()
+    for start, end in regions:
+        for piece in _split_long_region(energy, frame_length, int(start), int(end),
+                                        max_samples, search_samples=min(5 * sample_rate, max_samples // 2)):
+            if current.pieces and current.samples + piece[1] - piece[0] > max_samples:
+                chunks.append(current)
+                current = Chunk()
+            current.pieces.append(piece)
+    if current.pieces:
+        chunks.append(current)
+    return chunks
+
+
+def response_segment(start: float, end: float, text: str) -> dict:
+    """Segment as /stt/transcribe returns it: times rounded to milliseconds, text stripped"""
+    return {"start": round(start, 3), "end": round(end, 3), "text": text.strip()}
+
+
+def response_segments(segments: List[dict]) -> List[dict]:
+    return [response_segment(s["start"], s["end"], s["text"]) for s in segments]
+
+
+def stitch(chunks: List[Chunk], results: List[dict], sample_rate: int = SAMPLE_RATE) -> dict:
+    """Combine per-chunk Whisper results into one transcript with source timestamps"""
+    segments = []
+    languages = []
+    for chunk, result in zip(chunks, results):
+        if result.get("language"):
+            languages.append(result["language"])
+        chunk_segments = result.get("segments") or [
+            {"start": 0.0, "end": chunk.samples / sample_rate, "text": result.get("text", "")}
+        ]
+        for segment in chunk_segments:
+            text = segment["text"].strip()
+            if not text:
+                continue
+            segments.append(response_segment(
+                chunk.source_time(segment["start"], sample_rate),
+                chunk.source_time(segment["end"], sample_rate, end=True),
+                text,
+            ))
+
+    segments.sort(key=lambda segment: segment["start"])
+    return {
+        "text": " ".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": max(set(languages), key=languages.count) if languages else None,
+    }
@@ -4,6 +4,8 @@ import pytest
 from sqlmodel import create_engine, Session
 from fastapi.testclient import TestClient
 from app import main
+from app.benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from app.routers.chat import get_chat_agent
 
 PROD_DB_URL = os.environ.get("DATABASE_URL")
 if not PROD_DB_URL:
@@ -64,3 +66,22 @@ def session():
     engine = create_engine(TEST_DB_URL, pool_pre_ping=True)
     with Session(engine) as s:
         yield s
+
+
+@pytest.fixture
+def ollama_config():
+    """Behaviour of the fake Ollama server; override in a test module for other latencies or lengths."""
+    return FakeOllamaConfig(latency=0.01, num_tokens=4)
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch, ollama_config):
+    """Fake Ollama server, with one chat agent pointed at it serving every request of the test (as in the app)."""
+    from app.agents.chat_agent import OllamaChatAgent
+
+    with FakeOllamaServer(ollama_config) as server:
+        monkeypatch.setenv("OLLAMA_BASE_URL", server.base_url)
+        agent = OllamaChatAgent()
+        main.app.dependency_overrides[get_chat_agent] = lambda: agent
+        yield server
+        main.app.dependency_overrides.pop(get_chat_agent, None)
@@ -0,0 +1,46 @@
+from uuid import uuid4
+from app.agents.chat_agent import generation_metrics
+from app.models.base import ChatInteraction
+
+
+def test_generation_metrics_converts_ollama_timings():
+    """Test that Ollama's nanosecond timings and token counts are normalized"""
+    metrics = generation_metrics({
+        "prompt_eval_count": 12,
+        "eval_count": 30,
+        "load_duration": 500_000_000,
+        "prompt_eval_duration": 250_000_000,
+        "eval_duration": 1_500_000_000,
+        "total_duration": 2_250_000_000,
+    })
+    assert metrics["tokens_used"] == 42
+    assert metrics["load_duration"] == 0.5
+    assert metrics["eval_duration"] == 1.5
+    assert generation_metrics()["tokens_used"] is None
+
+
+def test_usage_analytics(client, session):
+    """Test that per-model aggregates are computed from stored metrics"""
+    model_name = f"analytics-{uuid4()}"
+    for processing_time in (1.0, 2.0, 3.0):
+        session.add(ChatInteraction(
+            model_name=model_name,
+            user_message="hi",
+            ai_response="hello",
+            processing_time=processing_time,
+            prompt_tokens=10,
+            completion_tokens=20,
+            load_duration=0.1,
+            prompt_eval_duration=0.5,
+            eval_duration=2.0,
+        ))
+    session.commit()
+
+    response = client.get("/analytics/usage", params={"model_name": model_name})
+    assert response.status_code == 200
+
+    [stats] = response.json()["models"]
+    assert stats["requests"] == 3
+    assert stats["latency_p50"] == 2.0
+    assert stats["tokens_per_second"] == 10.0
+    assert stats["prompt_eval_share"] == 0.2
@@ -0,0 +1,45 @@
+import httpx
+from app.benchmarks.fake_ollama import FakeOllamaConfig, FakeOllamaServer
+from app.benchmarks.stats import percentile, summarize
+
+
+def test_percentile_interpolates():
+    """Test that percentiles interpolate between sorted samples"""
+    values = [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert percentile(values, 50) == 3.0
+    assert percentile(values, 95) == 4.8
+    assert percentile([], 50) is None
+    assert summarize([])["p50"] is None
+    assert summarize(values)["max"] == 5.0
+
+
+def test_fake_ollama_streams_generation():
+    """Test that the fake Ollama server streams tokens and reports Ollama-style metrics"""
+    config = FakeOllamaConfig(latency=0.0, token_rate=0, num_tokens=4)
+    with FakeOllamaServer(config) as server:
+        tags = httpx.get(f"{server.base_url}/api/tags").json()
+        assert [m["name"] for m in tags["models"]] == config.models
+
+        with httpx.stream("POST", f"{server.base_url}/api/generate",
+                          json={"model": config.models[0], "prompt": "hello world"}) as response:
+            chunks = [line for line in response.iter_lines() if line]
+
+        assert len(chunks) == 5
+        final = httpx.Response(200, content=chunks[-1]).json()
+        assert final["done"] is True
+        assert final["eval_count"] == 4
+        assert final["prompt_eval_count"] == 2
+        assert server.stats["completed"] == 1
+
+
+def test_compare_reports_scenarios_without_successes(capsys):
+    """Test that a scenario with no successful requests prints n/a and counts as a regression"""
+    from app.benchmarks.load import compare
+
+    def run(p95, throughput):
+        return {"scenarios": {"chat": {"latency": {"p95": p95}, "throughput": throughput}}}
+
+    assert compare(run(None, None), run(0.2, 40.0), 0.1) == ["chat"]
+    assert "p95 200.0ms -> n/a (n/a)" in capsys.readouterr().out
+    assert compare(run(0.2, 40.0), run(None, None), 0.1) == []
+    assert compare(run(0.3, 40.0), run(0.2, 40.0), 0.1) == ["chat"]
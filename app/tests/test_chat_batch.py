@@ -0,0 +1,52 @@
+import json
+from uuid import uuid4
+from sqlmodel import select
+from app.models.base import ChatInteraction
+from app.routers import chat
+
+
+def test_batch_streams_results_and_bulk_persists(client, session, fake_ollama):
+    """Test that every item gets a line, failures are isolated and successes are stored"""
+    session_id = str(uuid4())
+    items = [
+        {"message": "first", "model_name": "llama3.1:8b", "session_id": session_id},
+        {"message": "second", "model_name": "mistral:7b", "session_id": session_id},
+        {"message": "third", "model_name": "missing:1b", "session_id": session_id},
+        {"message": "fourth", "model_name": "llama3.1:8b", "session_id": session_id},
+    ]
+    response = client.post("/chat/batch", json={"items": items, "concurrency": 2})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *results, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    # Grouped by model: both llama3.1 items come before mistral
+    assert {r["index"] for r in results[:2]} == {0, 3}
+    assert [r["index"] for r in results if r["error"]] == [2]
+    assert summary["summary"] == {
+        "total": 4, "succeeded": 3, "failed": 1, "persisted": 3, "persist_error": None
+    }
+
+    stored = session.exec(
+        select(ChatInteraction).where(ChatInteraction.session_id == session_id)
+    ).all()
+    assert sorted(i.user_message for i in stored) == ["first", "fourth", "second"]
+    assert all(i.completion_tokens == 4 for i in stored)
+
+
+def test_batch_rejects_empty_items(client):
+    """Test that a batch needs at least one item"""
+    response = client.post("/chat/batch", json={"items": []})
+    assert response.status_code == 422
+
+
+def test_batch_history_failure_is_an_error_response(client, fake_ollama, monkeypatch):
+    """Test that failing to load histories returns 500 instead of a truncated stream"""
+    def broken(session_ids):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(chat, "load_conversation_histories", broken)
+    response = client.post("/chat/batch", json={"items": [{"message": "hi", "model_name": "llama3.1:8b"}]})
+    assert response.status_code == 500
+    assert "database unavailable" in response.json()["detail"]
+    assert fake_ollama.stats["generations"] == 0
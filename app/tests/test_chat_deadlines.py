@@ -0,0 +1,80 @@
+import asyncio
+import time
+import pytest
+from sqlmodel import select
+from app.agents.chat_agent import OllamaChatAgent
+from app.benchmarks.fake_ollama import FakeOllamaConfig
+from app.models.base import ChatInteraction
+from app.routers import chat
+
+
+@pytest.fixture
+def ollama_config():
+    """Fake Ollama that needs ~5s per generation"""
+    return FakeOllamaConfig(latency=0.05, token_rate=20, num_tokens=100)
+
+
+def _wait_for_disconnect(server, timeout=2.0):
+    deadline = time.time() + timeout
+    while server.stats["disconnected"] == 0 and time.time() < deadline:
+        time.sleep(0.05)
+    return server.stats["disconnected"]
+
+
+def test_cancelling_achat_stops_ollama_generation(fake_ollama):
+    """Test that cancelling the agent task closes the Ollama stream mid-generation"""
+    agent = OllamaChatAgent()
+
+    async def cancel_soon():
+        task = asyncio.ensure_future(agent.achat("hello", "llama3.1:8b"))
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_soon())
+    assert _wait_for_disconnect(fake_ollama) == 1
+    assert fake_ollama.stats["completed"] == 0
+
+
+def test_chat_deadline_is_recorded(client, session, fake_ollama):
+    """Test that an exceeded X-Request-Timeout returns 504 and is stored as a timeout"""
+    response = client.post(
+        "/chat/",
+        json={"message": "hello", "model_name": "llama3.1:8b"},
+        headers={"X-Request-Timeout": "0.3"},
+    )
+    assert response.status_code == 504
+    assert _wait_for_disconnect(fake_ollama) == 1
+
+    interaction = session.exec(
+        select(ChatInteraction).order_by(ChatInteraction.id.desc())
+    ).first()
+    assert interaction.status == "timeout"
+    assert interaction.ai_response == ""
+
+
+def test_header_only_shortens_the_configured_deadline(monkeypatch):
+    """Test that X-Request-Timeout can lower CHAT_REQUEST_TIMEOUT but not raise or disable it"""
+    monkeypatch.setattr(chat, "CHAT_REQUEST_TIMEOUT", 10.0)
+    assert chat.request_timeout(None) == 10.0
+    assert chat.request_timeout(2.0) == 2.0
+    assert chat.request_timeout(60.0) == 10.0
+    assert chat.request_timeout(0.0) == 10.0
+    assert chat.request_timeout(-1.0) == 10.0
+
+    monkeypatch.setattr(chat, "CHAT_REQUEST_TIMEOUT", 0.0)
+    assert chat.request_timeout(None) is None
+    assert chat.request_timeout(2.0) == 2.0
+
+
+def test_zero_header_keeps_the_configured_deadline(client, monkeypatch, fake_ollama):
+    """Test that X-Request-Timeout: 0 doesn't remove the server's deadline"""
+    monkeypatch.setattr(chat, "CHAT_REQUEST_TIMEOUT", 0.3)
+    response = client.post(
+        "/chat/",
+        json={"message": "hello", "model_name": "llama3.1:8b"},
+        headers={"X-Request-Timeout": "0"},
+    )
+    assert response.status_code == 504
+    assert _wait_for_disconnect(fake_ollama) == 1
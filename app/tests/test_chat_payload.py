@@ -0,0 +1,52 @@
+import pytest
+from app.benchmarks.fake_ollama import FakeOllamaConfig
+
+
+@pytest.fixture
+def ollama_config():
+    """Long enough responses to cross the compression threshold"""
+    return FakeOllamaConfig(latency=0.0, token_rate=0, num_tokens=300)
+
+
+def _chat(client, session_id=None, **fields):
+    body = {"message": "hello", "model_name": "llama3.1:8b", "session_id": session_id, **fields}
+    response = client.post("/chat/", json=body, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_history_modes_trim_conversation(client, fake_ollama):
+    """Test that "new" and "since" return only the requested turns"""
+    session_id = _chat(client)["session_id"]
+    _chat(client, session_id)
+
+    full = _chat(client, session_id)
+    assert full["turn_index"] == 2
+    assert full["history_start"] == 0
+    assert len(full["conversation_history"]) == 6
+
+    new = _chat(client, session_id, history="new")
+    assert new["turn_index"] == 3
+    assert [m["role"] for m in new["conversation_history"]] == ["user", "assistant"]
+    assert new["conversation_history"][1]["content"] == new["response"]
+
+    since = _chat(client, session_id, history="since", since_turn=2)
+    assert since["history_start"] == 2
+    assert len(since["conversation_history"]) == 6
+
+
+def test_large_responses_are_compressed(client, fake_ollama):
+    """Test that brotli is preferred, gzip is the fallback and small bodies are left alone"""
+    body = {"message": "hello", "model_name": "llama3.1:8b"}
+
+    response = client.post("/chat/", json=body, headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    # The client decodes the body; Content-Length is the compressed size
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert response.json()["response"]
+
+    response = client.post("/chat/", json=body, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+
+    response = client.get("/health", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in response.headers
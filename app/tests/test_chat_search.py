@@ -0,0 +1,52 @@
+from uuid import uuid4
+from app.models.base import ChatInteraction
+
+
+def _add_interactions(session, session_id, pairs):
+    for user_message, ai_response in pairs:
+        session.add(ChatInteraction(
+            session_id=session_id,
+            model_name="llama3.1:8b",
+            user_message=user_message,
+            ai_response=ai_response,
+        ))
+    session.commit()
+
+
+def test_search_ranks_and_filters(client, session):
+    """Test that search matches stemmed terms in both messages, ranked and filtered"""
+    session_id = str(uuid4())
+    _add_interactions(session, session_id, [
+        ("How do I reset my password?", "Use the password reset link on the login page."),
+        ("What is the weather like?", "It is sunny."),
+        ("I forgot my login", "You can reset it from the account page."),
+    ])
+
+    response = client.get("/chat/search", params={"q": "resetting password", "session_id": session_id})
+    assert response.status_code == 200
+
+    results = response.json()["results"]
+    assert [r["user_message"] for r in results] == ["How do I reset my password?"]
+
+    response = client.get("/chat/search", params={"q": "reset", "session_id": session_id})
+    assert len(response.json()["results"]) == 2
+
+
+def test_search_keyset_pagination(client, session):
+    """Test that following next_cursor walks every match exactly once"""
+    session_id = str(uuid4())
+    _add_interactions(session, session_id, [(f"deploy question {i}", "kubernetes answer") for i in range(5)])
+
+    seen, cursor = [], None
+    for _ in range(5):
+        params = {"q": "kubernetes", "session_id": session_id, "sort": "recent", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/chat/search", params=params).json()
+        seen.extend(r["id"] for r in page["results"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert len(seen) == 5
+    assert seen == sorted(seen, reverse=True)
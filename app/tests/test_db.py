@@ -1,5 +1,7 @@
 import os
+from sqlalchemy import inspect
 from sqlmodel import select
+from app import database
 
 
 def test_test_db(session):
@@ -10,3 +12,19 @@ def test_test_db(session):
 
     result = session.exec(select(1)).one()
     assert result == 1
+
+
+def test_migrate_adds_missing_columns_and_indexes(client):
+    """Test that the migration step restores a dropped column and index and is a no-op when repeated"""
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_chatinteraction_search_vector")
+        conn.exec_driver_sql("ALTER TABLE chatinteraction DROP COLUMN search_vector")
+        conn.exec_driver_sql("DROP INDEX ix_chatinteraction_created_at")
+
+    database.migrate()
+    database.migrate()
+
+    inspector = inspect(database.engine)
+    assert "search_vector" in {column["name"] for column in inspector.get_columns("chatinteraction")}
+    indexes = {index["name"] for index in inspector.get_indexes("chatinteraction")}
+    assert {"ix_chatinteraction_search_vector", "ix_chatinteraction_created_at"} <= indexes
@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+from app.agents.response_cache import ResponseCache, make_cache_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _messages(content):
+    return [{"role": "user", "content": content}]
+
+
+def test_cache_key_normalizes_messages():
+    """Test that keys ignore surrounding whitespace and line endings but not options"""
+    key = make_cache_key("llama3.1:8b", {"temperature": 0}, _messages("Hello\r\nworld "))
+    assert key == make_cache_key("llama3.1:8b", {"temperature": 0}, _messages("Hello\nworld"))
+    assert key != make_cache_key("llama3.1:8b", {"temperature": 0.5}, _messages("Hello\nworld"))
+    assert key != make_cache_key("mistral:7b", {"temperature": 0}, _messages("Hello\nworld"))
+
+
+def test_ttl_and_lru_eviction():
+    """Test that entries expire after the TTL and the least recently used is evicted"""
+    clock = FakeClock()
+    cache = ResponseCache(max_entries=2, ttl=10, clock=clock)
+    cache.set("a", {"response": "a"})
+    cache.set("b", {"response": "b"})
+    assert cache.get("a") == {"response": "a"}
+
+    cache.set("c", {"response": "c"})
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+    clock.now = 11
+    assert cache.get("a") is None
+
+
+def test_concurrent_misses_share_one_computation():
+    """Test that N identical concurrent requests trigger exactly one computation"""
+    cache = ResponseCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"response": "answer", "error": ""}
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert sorted(status for _, status in results) == ["coalesced"] * 4 + ["miss"]
+    assert all(result["response"] == "answer" for result, _ in results)
+    assert asyncio.run(cache.get_or_compute("key", compute))[1] == "hit"
+
+
+def test_errors_are_not_cached():
+    """Test that failed generations are returned but not stored"""
+    cache = ResponseCache()
+
+    async def compute():
+        return {"response": "", "error": "boom"}
+
+    assert asyncio.run(cache.get_or_compute("key", compute))[1] == "miss"
+    assert cache.get("key") is None
+
+
+def test_computation_cancelled_when_all_waiters_leave():
+    """Test that the shared computation is cancelled only after every waiter is gone"""
+    cache = ResponseCache()
+    started = []
+    cancelled = []
+
+    async def compute():
+        started.append(1)
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return {"response": "late"}
+
+    async def run():
+        first = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        second = asyncio.ensure_future(cache.get_or_compute("key", compute))
+        await asyncio.sleep(0.01)
+
+        first.cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+
+        second.cancel()
+        await asyncio.sleep(0.01)
+        for task in (first, second):
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+    asyncio.run(run())
+    assert started == [1]
+    assert cancelled == [1]
+
+
+def test_repeated_chat_is_answered_from_the_shared_agent_cache(client, fake_ollama):
+    """Test that a repeated deterministic /chat/ request is served from the app's single agent's cache"""
+    body = {"message": "What is 2+2?", "model_name": "llama3.1:8b", "temperature": 0}
+    first = client.post("/chat/", json=body)
+    second = client.post("/chat/", json=body)
+
+    assert first.json()["cache"] == "miss"
+    assert second.json()["cache"] == "hit"
+    assert second.json()["response"] == first.json()["response"]
+    assert fake_ollama.stats["generations"] == 1
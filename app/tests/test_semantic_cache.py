@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+import numpy as np
+from app.agents.semantic_cache import SemanticCache, VectorIndex, scope_hash
+from app.benchmarks.fake_ollama import fake_embedding
+
+
+async def stub_embed(texts):
+    """Local stand-in for Ollama's embeddings API"""
+    return [fake_embedding(text, 32) for text in texts]
+
+
+def test_batched_search_respects_scope(tmp_path):
+    """Test that a batch of queries finds its nearest entry within its own scope"""
+    index = VectorIndex(tmp_path, dim=3, capacity=8)
+    index.add([1, 0, 0], scope=1, payload={"response": "x"})
+    index.add([0, 1, 0], scope=1, payload={"response": "y"})
+    index.add([1, 0, 0], scope=2, payload={"response": "x2"})
+
+    slots, scores = index.search(np.array([[2, 0.1, 0], [0, 1, 0.1], [0, 0, 1]]), [1, 1, 3])
+    assert list(slots) == [0, 1, -1]
+    assert scores[0] > 0.99
+    assert index.get(2) == {"response": "x2"}
+
+
+def test_capacity_evicts_least_recently_used(tmp_path):
+    """Test that a full index replaces the entry that was used least recently"""
+    index = VectorIndex(tmp_path, dim=2, capacity=2)
+    index.add([1, 0], scope=0, payload={"response": "old"})
+    index.add([0, 1], scope=0, payload={"response": "recent"})
+    index.get(1)
+
+    assert index.add([1, 1], scope=0, payload={"response": "new"}) == 0
+    assert len(index) == 2
+    assert index.get(0) == {"response": "new"}
+
+
+def test_index_survives_reopen(tmp_path):
+    """Test that vectors and payloads are read back from the memory-mapped files"""
+    index = VectorIndex(tmp_path, dim=2, capacity=4)
+    index.add([1, 0], scope=5, payload={"response": "kept"})
+    del index
+
+    reopened = VectorIndex(tmp_path, dim=2, capacity=4)
+    [slot], _ = reopened.search(np.array([[1, 0]]), [5])
+    assert reopened.get(int(slot)) == {"response": "kept"}
+
+
+def test_paraphrase_hits_above_threshold(tmp_path):
+    """Test that a reworded prompt is answered from the cache and a different one is not"""
+    cache = SemanticCache(str(tmp_path), embed=stub_embed, threshold=0.9, capacity=16)
+    scope = scope_hash("llama3.1:8b", {}, [])
+
+    async def run():
+        payload, _, vector = await cache.lookup("How do I reset my password?", scope)
+        assert payload is None
+        cache.store(vector, scope, {"response": "Use the reset link."})
+
+        hit, similarity, _ = await cache.lookup("how do I reset my password", scope)
+        miss, _, _ = await cache.lookup("what is the weather in Paris", scope)
+        return hit, similarity, miss
+
+    hit, similarity, miss = asyncio.run(run())
+    assert hit == {"response": "Use the reset link."}
+    assert similarity >= 0.9
+    assert miss is None
+
+
+def test_indexes_sharing_files_do_not_mix_up_payloads(tmp_path):
+    """Test that two processes' views of one index fill different slots and never return another entry's payload"""
+    first = VectorIndex(tmp_path, dim=2, capacity=2)
+    second = VectorIndex(tmp_path, dim=2, capacity=2)
+
+    assert first.add([1, 0], scope=0, payload={"response": "x"}) == 0
+    assert second.add([0, 1], scope=0, payload={"response": "y"}) == 1
+    assert second.get(0) == {"response": "x"}
+    assert first.get(1) == {"response": "y"}
+
+    # The second view evicts slot 0; the first must not pair the new vector with its old payload
+    second.get(1)
+    assert second.add([1, 1], scope=0, payload={"response": "z"}) == 0
+    assert first.lookup([1, 1], scope=0, min_score=0.99) == ({"response": "z"}, pytest.approx(1.0))
+
+
+def test_agent_answers_paraphrase_from_semantic_stage(monkeypatch, tmp_path, fake_ollama):
+    """Test that the LangGraph semantic lookup answers a reworded prompt after the store stage indexed the first"""
+    from app.agents import chat_agent
+
+    monkeypatch.setattr(chat_agent, "SEMANTIC_CACHE_ENABLED", True)
+    monkeypatch.setattr(chat_agent, "SEMANTIC_CACHE_PATH", str(tmp_path))
+    monkeypatch.setattr(chat_agent, "SEMANTIC_CACHE_THRESHOLD", 0.9)
+    agent = chat_agent.OllamaChatAgent()
+
+    async def run():
+        first = await agent.achat("How do I reset my password?", "llama3.1:8b", use_cache=True)
+        second = await agent.achat("Please, how do I reset my password?", "llama3.1:8b", use_cache=True)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first["cache"] == "miss"
+    assert second["cache"] == "semantic"
+    assert second["similarity"] >= 0.9
+    assert second["response"] == first["response"]
+    assert fake_ollama.stats["generations"] == 1
+
+
+def test_rebuilt_index_releases_the_old_lock_file(tmp_path):
+    """Test that replacing the index for a new embedding dimension closes the old one"""
+    cache = SemanticCache(str(tmp_path), embed=stub_embed, capacity=4)
+    old = cache._get_index(2)
+    cache._get_index(3)
+    assert old._lock_file.closed
+    assert not cache.index._lock_file.closed
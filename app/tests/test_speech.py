@@ -0,0 +1,248 @@
+import asyncio
+import multiprocessing
+import sys
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+from app.benchmarks import fake_whisper
+from app.benchmarks.load import make_wav
+from app.benchmarks.stt_chunking import make_recording
+from app.speech import engines
+from app.speech.pool import PoolCache, TranscriptionPool
+from app.routers import stt
+from app.speech.vad import SAMPLE_RATE, Chunk, detect_speech, plan_chunks, stitch
+
+
+def test_detect_speech_finds_bursts_and_skips_silence():
+    """Test that each speech burst becomes one padded region and pauses are left out"""
+    audio = make_recording(36, speech_seconds=8, pause_seconds=4)
+    regions = detect_speech(audio, pad_ms=200) / SAMPLE_RATE
+
+    assert len(regions) == 3
+    for (start, end), expected_start in zip(regions, (0, 12, 24)):
+        assert abs(start - max(0, expected_start - 0.2)) < 0.1
+        assert abs(end - (expected_start + 8.2)) < 0.1
+
+    assert len(detect_speech(np.zeros(SAMPLE_RATE * 5, dtype=np.float32))) == 0
+
+
+def test_chunks_respect_max_length_and_map_back_to_source():
+    """Test that regions are packed into bounded chunks and chunk times map to source times"""
+    audio = make_recording(120, speech_seconds=20, pause_seconds=5)
+    chunks = plan_chunks(audio, detect_speech(audio), max_chunk_seconds=30)
+
+    assert all(chunk.samples <= 30 * SAMPLE_RATE for chunk in chunks)
+    assert sum(chunk.samples for chunk in chunks) < 0.9 * len(audio)
+
+    chunk = Chunk(pieces=[(SAMPLE_RATE * 10, SAMPLE_RATE * 15), (SAMPLE_RATE * 40, SAMPLE_RATE * 50)])
+    assert chunk.source_time(2.0) == 12.0
+    assert chunk.source_time(7.0) == 42.0
+    assert chunk.source_time(99.0) == 50.0
+    # On the boundary between pieces: a start is in the later piece, an end in the earlier one
+    assert chunk.source_time(5.0) == 40.0
+    assert chunk.source_time(5.0, end=True) == 15.0
+    assert chunk.source_time(0.0, end=True) == 10.0
+
+
+def test_stitch_offsets_segments_and_orders_them():
+    """Test that per-chunk segments are shifted to source time and joined in order"""
+    first = Chunk(pieces=[(0, SAMPLE_RATE * 10)])
+    second = Chunk(pieces=[(SAMPLE_RATE * 60, SAMPLE_RATE * 70)])
+    result = stitch([second, first], [
+        {"text": " world", "language": "en", "segments": [{"start": 1.0, "end": 3.0, "text": " world"}]},
+        {"text": " hello", "language": "en", "segments": [{"start": 0.5, "end": 2.0, "text": " hello"}]},
+    ])
+
+    assert result["text"] == "hello world"
+    assert result["segments"] == [
+        {"start": 0.5, "end": 2.0, "text": "hello"},
+        {"start": 61.0, "end": 63.0, "text": "world"},
+    ]
+    assert result["language"] == "en"
+
+
+class BarrierEngine(fake_whisper.FakeEngine):
+    """Fake engine whose first transcription in each worker waits until `barrier.parties` workers are in one"""
+
+    def __init__(self, *args, barrier=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.barrier = barrier
+        self.waited = False
+
+    def _transcribe(self, audio, language):
+        if not self.waited:
+            self.waited = True
+            self.barrier.wait(timeout=60)
+        return super()._transcribe(audio, language)
+
+
+def test_pool_transcribes_chunks_in_parallel(monkeypatch):
+    """Test that chunks run concurrently in worker processes and come back stitched"""
+    monkeypatch.setenv("FAKE_WHISPER_RTF", "0")
+    audio = make_recording(80, speech_seconds=16, pause_seconds=4)
+    monkeypatch.setitem(engines.ENGINES, "barrier", BarrierEngine)
+    # Only passes if three workers are transcribing at the same time; a serial pool breaks the barrier
+    barrier = multiprocessing.get_context("spawn").Barrier(3)
+    pool = TranscriptionPool("tiny", workers=3, engine="barrier", max_chunk_seconds=20, barrier=barrier)
+    try:
+        chunks = pool.plan(audio)
+        result = asyncio.run(pool.transcribe(audio, chunks))
+    finally:
+        pool.shutdown()
+
+    assert len(result["segments"]) == len(chunks) == 4
+    assert [s["start"] for s in result["segments"]] == sorted(s["start"] for s in result["segments"])
+    assert abs(result["segments"][1]["start"] - 19.8) < 0.1
+
+
+class FakePool:
+    def __init__(self, key):
+        self.key = key
+        self.stopped = False
+
+    def shutdown(self):
+        self.stopped = True
+
+
+def test_pool_cache_retires_pools_only_when_idle():
+    """Test that an evicted pool keeps serving its current requests and stops after them"""
+    pools = PoolCache(FakePool, max_pools=1)
+    with pools.acquire("tiny") as tiny:
+        with pools.acquire("base") as base:
+            assert not tiny.stopped
+            with pools.acquire("base") as again:
+                assert again is base
+        assert not tiny.stopped
+    assert tiny.stopped
+    assert not base.stopped
+
+    with pools.acquire("tiny") as fresh:
+        assert fresh is not tiny
+    assert base.stopped
+
+    pools.close()
+    assert fresh.stopped
+
+
+def test_shutdown_closes_transcription_pools(monkeypatch):
+    """Test that the app's lifespan teardown stops the worker pools"""
+    from fastapi.testclient import TestClient
+    from app import main
+
+    monkeypatch.setattr(stt, "pools", PoolCache(FakePool, max_pools=2))
+    with TestClient(main.app):
+        with stt.pools.acquire("tiny") as pool:
+            pass
+        assert not pool.stopped
+    assert pool.stopped
+
+
+def test_transcribe_selects_engine_by_name(client, monkeypatch):
+    """Test that the engine query parameter picks the engine, in process and in the pool, and unknown engines are rejected"""
+    monkeypatch.setitem(engines.ENGINES, "fake", fake_whisper.FakeEngine)
+    monkeypatch.setattr(stt, "pools", PoolCache(stt.create_transcription_pool, 1))
+    files = {"audio_file": ("clip.wav", make_wav(3), "audio/wav")}
+    try:
+        response = client.post("/stt/transcribe", params={"model": "tiny", "engine": "fake"}, files=files)
+        chunked = client.post("/stt/transcribe", params={"model": "tiny", "engine": "fake", "chunked": True},
+                              files=files)
+    finally:
+        stt.pools.close()
+        stt.get_engine.cache_clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["engine"] == "fake"
+    assert data["precision"] == "fp32"
+    assert data["chunks"] == 1
+    assert data["transcribed_text"] == "speech 3.00s"
+
+    assert chunked.status_code == 200
+    assert chunked.json()["engine"] == "fake"
+    assert chunked.json()["chunks"] == 1
+
+    response = client.post("/stt/transcribe", params={"engine": "nope"}, files=files)
+    assert response.status_code == 400
+
+
+def test_gpu_check_runs_off_the_event_loop(monkeypatch):
+    """Test that the torch import behind gpu_available happens in a worker thread, not on the event loop"""
+    checked_in = []
+
+    def is_available():
+        checked_in.append(threading.current_thread())
+        return False
+
+    class Created(Exception):
+        pass
+
+    def create_pool(key):
+        stt.gpu_available()
+        raise Created
+
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(cuda=types.SimpleNamespace(is_available=is_available)))
+    monkeypatch.setattr(stt, "pools", PoolCache(create_pool, 1))
+    stt.gpu_available.cache_clear()
+    try:
+        with pytest.raises(Created):
+            asyncio.run(stt.transcribe_chunked(np.zeros(SAMPLE_RATE, dtype=np.float32), "whisper", "tiny", None))
+    finally:
+        stt.gpu_available.cache_clear()
+
+    assert len(checked_in) == 1
+    assert checked_in[0] is not threading.main_thread()
+
+
+def test_concurrent_first_requests_load_the_engine_once(monkeypatch):
+    """Test that in-process transcriptions racing on a cold cache share one loaded model"""
+    loads = []
+
+    class SlowLoadingEngine(fake_whisper.FakeEngine):
+        def __init__(self, *args, **kwargs):
+            loads.append(args[0])
+            time.sleep(0.2)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setitem(engines.ENGINES, "slow-load", SlowLoadingEngine)
+    stt.get_engine.cache_clear()
+    audio = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(
+                lambda _: stt.transcribe_whole(audio, "slow-load", "tiny", None), range(4)
+            ))
+    finally:
+        stt.get_engine.cache_clear()
+
+    assert loads == ["tiny"]
+    assert [result["text"] for result in results] == [" speech 1.00s"] * 4
+
+
+def test_int8_falls_back_to_fp32_when_unsupported(monkeypatch):
+    """Test that a failed quantization is reported as fp32 instead of failing the load"""
+    def unsupported(model):
+        raise RuntimeError("No quantized backend available")
+
+    monkeypatch.setattr(engines, "quantize_int8", unsupported)
+    assert engines.quantize_or_fallback(object(), "int8") == (None, "fp32")
+
+    model = object()
+    assert engines.quantize_or_fallback(model, "none") == (model, "fp32")
+
+
+def test_int8_quantization_replaces_whisper_linear_layers():
+    """Test that every Linear layer of a Whisper model is dynamically quantized and the model still runs"""
+    torch = pytest.importorskip("torch")
+    whisper_model = pytest.importorskip("whisper.model")
+    dims = whisper_model.ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1,
+    )
+    model = engines.quantize_int8(whisper_model.Whisper(dims).eval())
+
+    modules = list(model.modules())
+    assert not any(type(m) in (whisper_model.Linear, torch.nn.Linear) for m in modules)
+    assert any(type(m) is torch.ao.nn.quantized.dynamic.Linear for m in modules)
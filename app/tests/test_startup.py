@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import app
+
+PROJECT_ROOT = Path(app.__file__).resolve().parent.parent
+HEAVY_MODULES = ("whisper", "torch", "langgraph", "langchain_core", "langchain_ollama")
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET", "3.0"))
+
+
+def _import_profile():
+    """Import app.main in a fresh interpreter with -X importtime.
+
+    Returns the heavy modules that ended up imported and the per-module
+    cumulative import times in seconds.
+    """
+    check = f"import sys, app.main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line[len("import time:"):].split("|")
+        cumulative[module.strip()] = int(cumulative_us) / 1e6
+    loaded = [m for m in result.stdout.strip().split(",") if m]
+    return loaded, cumulative
+
+
+def test_app_import_is_lazy():
+    """Test that importing the app does not load whisper/torch or the LangChain stack"""
+    loaded, cumulative = _import_profile()
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    assert loaded == [], f"Heavy modules imported at startup: {loaded}. Slowest imports: {slowest}"
+    assert cumulative["app.main"] < IMPORT_BUDGET_SECONDS, f"Slow app import. Slowest imports: {slowest}"
@@ -0,0 +1,109 @@
+import json
+import threading
+import pytest
+from app import profiling, tracing
+from app.benchmarks.fake_ollama import FakeOllamaConfig
+
+
+@pytest.fixture
+def ollama_config():
+    """Fake Ollama with a measurable prefill and no per-token delay"""
+    return FakeOllamaConfig(latency=0.02, token_rate=0, num_tokens=8)
+
+
+def test_chat_request_is_traced(client, fake_ollama):
+    """Test that a chat request returns its trace id and records the main phases as nested spans"""
+    response = client.post("/chat/", json={"message": "hello", "model_name": "llama3.1:8b"})
+    assert response.status_code == 200
+    trace = tracing.exporter.find(response.headers["x-trace-id"])
+
+    spans = {span.name: span for span in trace.spans}
+    assert trace.root.name == "POST /chat/"
+    assert trace.root.attributes["http.status_code"] == 200
+    for name in ("db.session", "chat.load_history", "db.query", "chat.generate", "agent.achat",
+                 "graph.compile", "llm.generate", "ollama.prefill", "ollama.generation", "chat.save_interaction"):
+        assert name in spans, f"missing span {name}"
+
+    span_ids = {span.span_id for span in trace.spans}
+    assert all(span.parent_id in span_ids for span in trace.spans if span is not trace.root)
+    assert spans["llm.generate"].attributes["llm.completion_tokens"] == 8
+    assert spans["ollama.generation"].end_ns <= spans["llm.generate"].end_ns
+
+
+def test_unsampled_traceparent_is_respected(client):
+    """Test that an upstream "not sampled" decision skips tracing"""
+    traceparent = "00-" + "a" * 32 + "-" + "b" * 16 + "-00"
+    response = client.get("/health", headers={"traceparent": traceparent})
+    assert "x-trace-id" not in response.headers
+
+    response = client.get("/health", headers={"traceparent": traceparent[:-2] + "01"})
+    assert response.headers["x-trace-id"] == "a" * 32
+
+
+def test_spans_export_as_otlp_json(tmp_path):
+    """Test that finished traces are written as OTLP/JSON lines"""
+    exporter = tracing.TraceExporter(str(tmp_path / "traces.jsonl"))
+    root = tracing.start_trace("job")
+    child = tracing.Span(root.trace, "step", parent_id=root.span_id, attributes={"rows": 3})
+    child.end()
+    root.end()
+    exporter.submit(root.trace, root.trace.spans)
+
+    assert exporter.flush(timeout=30)
+    [line] = (tmp_path / "traces.jsonl").read_text().splitlines()
+    [scope] = json.loads(line)["resourceSpans"][0]["scopeSpans"]
+    step, job = scope["spans"]
+    assert step["parentSpanId"] == job["spanId"]
+    assert step["traceId"] == job["traceId"] == root.trace_id
+    assert step["attributes"] == [{"key": "rows", "value": {"intValue": "3"}}]
+
+
+def test_sampling_profiler_collapses_stacks():
+    """Test that the profiler attributes samples to the function a thread is busy in"""
+    stop = threading.Event()
+
+    def busy_loop():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_loop, name="busy worker")
+    worker.start()
+    try:
+        output = profiling.collapsed(profiling.sample_stacks(0.2, interval=0.002))
+    finally:
+        stop.set()
+        worker.join()
+
+    busy = [line for line in output.splitlines() if line.startswith("busy_worker;")]
+    assert busy and "busy_loop" in busy[0]
+    assert int(busy[0].rsplit(" ", 1)[1]) > 10
+
+
+class _Route:
+    def __init__(self, path_format):
+        self.path_format = path_format
+
+
+@pytest.mark.parametrize("path_format", ["/{request_id}", "/models/{request_id}"])
+def test_route_template_keeps_router_prefix(path_format):
+    """Test that the template has the router prefix whether or not the matched route includes it"""
+    scope = {"route": _Route(path_format), "path": "/models/abc", "path_params": {"request_id": "abc"}}
+    assert tracing.route_template(scope) == "/models/{request_id}"
+    assert tracing.route_template({"path": "/nowhere"}) is None
+
+
+def test_spans_past_the_limit_are_dropped_and_counted(monkeypatch):
+    """Test that a trace keeps at most TRACE_MAX_SPANS spans and records how many it dropped"""
+    monkeypatch.setattr(tracing, "TRACE_MAX_SPANS", 5)
+    exporter = tracing.TraceExporter()
+    monkeypatch.setattr(tracing, "exporter", exporter)
+
+    root = tracing.start_trace("POST /chat/batch")
+    for i in range(10):
+        tracing.Span(root.trace, f"item {i}", parent_id=root.span_id).end()
+    root.end()
+
+    trace = exporter.find(root.trace_id)
+    assert len(trace.spans) == 5
+    assert trace.spans[-1] is root
+    assert root.attributes["trace.dropped_spans"] == 6
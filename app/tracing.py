@@ -0,0 +1,386 @@
+"""
+Lightweight in-process request tracing.
+
+Spans are tracked in a context variable, so they nest across `await`, tasks
+and `run_in_threadpool` calls without being passed around. Each HTTP request
+becomes a trace (see TracingMiddleware); sampled traces get an `X-Trace-Id`
+response header. Finished traces are kept in memory for `/admin/traces` and,
+if TRACE_EXPORT is set, exported as OTLP/JSON by a background thread:
+    TRACE_EXPORT=/var/log/traces.jsonl                  one ExportTraceServiceRequest per line
+    TRACE_EXPORT=http://otel-collector:4318/v1/traces   OTLP/HTTP JSON collector
+
+When a request is not sampled, `span()` is a cheap no-op.
+"""
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests that are traced (an incoming W3C traceparent header's sampled flag wins)
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "ollama-fastapi")
+# Finished traces kept in memory for /admin/traces
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))
+# Spans kept per trace; a /chat/batch request is one trace with spans for every item.
+# Spans past the limit are dropped and counted in the root's trace.dropped_spans attribute
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "1000"))
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+class Span:
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str] = None,
+                 kind: int = SPAN_KIND_INTERNAL, start_ns: Optional[int] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, error: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is None:
+            self.end_ns = end_ns or time.time_ns()
+            self.trace.span_ended(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6 if self.end_ns else None,
+            "status": "error" if self.status == STATUS_ERROR else "ok",
+            "status_message": self.status_message,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned when the current request is not sampled"""
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, error):
+        pass
+
+    def end(self, end_ns=None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """The spans of one request; exported once its root span ends"""
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+
+    def span_ended(self, span: Span):
+        with self._lock:
+            if self.root is not None and self.root.end_ns is not None and span is not self.root:
+                # Ended after the request finished (e.g. a dependency's cleanup): export on its own
+                late = True
+            elif span is not self.root and len(self.spans) >= TRACE_MAX_SPANS - 1:
+                # Leave room for the root, which ends last
+                self.dropped_spans += 1
+                return
+            else:
+                self.spans.append(span)
+                late = False
+            if span is self.root and self.dropped_spans:
+                span.set_attribute("trace.dropped_spans", self.dropped_spans)
+        if late:
+            exporter.submit(self, [span])
+        elif span is self.root:
+            exporter.submit(self, self.spans)
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace_id, parent_span_id, sampled) from a W3C traceparent header, or None"""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def start_trace(name: str, traceparent: Optional[str] = None,
+                attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+    """Root span of a new trace, or None when the trace is not sampled"""
+    parent = parse_traceparent(traceparent)
+    if parent:
+        trace_id, parent_id, sampled = parent
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    if not sampled:
+        return None
+
+    trace = Trace(trace_id)
+    trace.root = Span(trace, name, parent_id=parent_id, kind=SPAN_KIND_SERVER, attributes=attributes)
+    return trace.root
+
+
+def start_span(name: str, **attributes) -> Span:
+    """Child of the current span that is not made current; the caller must end() it.
+
+    For work whose start and end run in different contexts, such as a
+    generator dependency that FastAPI enters and exits in separate threads.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time a block as a child of the current span"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+
+    child = Span(parent.trace, name, parent_id=parent.span_id, attributes=attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, **attributes) -> Span:
+    """Add an already finished child of the current span, e.g. from timings reported by Ollama"""
+    parent = _current_span.get()
+    if parent is None:
+        return NOOP_SPAN
+    child = Span(parent.trace, name, parent_id=parent.span_id, start_ns=start_ns, attributes=attributes)
+    child.end(end_ns)
+    return child
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def to_otlp(spans: List[Span]) -> Dict[str, Any]:
+    """OTLP/JSON ExportTraceServiceRequest for a list of spans"""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [
+                    {
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        "parentSpanId": s.parent_id or "",
+                        "name": s.name,
+                        "kind": s.kind,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns),
+                        "attributes": _otlp_attributes(s.attributes),
+                        "status": {"code": s.status, "message": s.status_message},
+                    }
+                    for s in spans
+                ],
+            }],
+        }]
+    }
+
+
+class TraceExporter:
+    """Keeps recent traces in memory and ships finished spans from a background thread"""
+
+    def __init__(self, target: str = "", buffer_size: int = 200):
+        self.target = target
+        self.recent: deque = deque(maxlen=buffer_size)
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace, spans: List[Span]):
+        if trace.root is not None and spans is trace.spans:
+            self.recent.append(trace)
+        if not self.target:
+            return
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(list(spans))
+        except queue.Full:
+            logger.warning("Trace export queue full, dropping spans")
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        client = None
+        while True:
+            spans = self._queue.get()
+            try:
+                payload = orjson.dumps(to_otlp(spans))
+                if self.target.startswith(("http://", "https://")):
+                    import httpx
+                    client = client or httpx.Client(timeout=5.0)
+                    client.post(self.target, content=payload, headers={"Content-Type": "application/json"})
+                else:
+                    with open(self.target, "ab") as out:
+                        out.write(payload + b"\n")
+            except Exception as e:
+                logger.warning(f"Trace export failed: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every submitted batch has been exported; False if that took longer than timeout"""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def find(self, trace_id: str) -> Optional[Trace]:
+        for trace in reversed(self.recent):
+            if trace.trace_id == trace_id:
+                return trace
+        return None
+
+
+exporter = TraceExporter(TRACE_EXPORT, TRACE_BUFFER_SIZE)
+
+
+def route_template(scope) -> Optional[str]:
+    """Matched route with its prefix, e.g. /models/{request_id}, so spans group by endpoint.
+
+    Whether the matched route's path_format includes the include_router prefix
+    differs between FastAPI versions. This only relies on the request path
+    ending with path_format filled in with the path parameters; whatever
+    precedes that is taken as the prefix (empty when path_format has it).
+    """
+    path_format = getattr(scope.get("route"), "path_format", None)
+    if not path_format:
+        return None
+    try:
+        rendered = path_format.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return path_format
+    path = scope["path"]
+    if path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + path_format
+    return path_format
+
+
+class TracingMiddleware:
+    """ASGI middleware that makes every sampled request a trace and returns its id in X-Trace-Id"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope.get("headers", []):
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+        root = start_trace(f"{scope['method']} {scope['path']}", traceparent, {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+        })
+        if root is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                root.set_attribute("http.status_code", message["status"])
+                if message["status"] >= 500:
+                    root.status = STATUS_ERROR
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", root.trace_id.encode())]
+            await send(message)
+
+        token = _current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        except BaseException as e:
+            root.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            route = route_template(scope)
+            if route:
+                root.name = f"{scope['method']} {route}"
+                root.set_attribute("http.route", route)
+            root.end()